@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cod_inventory.settings')
+# hot read endpoints run on the event loop instead of taking a thread each
+os.environ.setdefault('ASYNC_API_VIEWS', 'True')
 
 application = get_asgi_application()
+
+# weapon catalog snapshot, built in the background so boot stays fast
+from inventory import snapshot  # noqa: E402
+
+snapshot.start()
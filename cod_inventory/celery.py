@@ -2,6 +2,9 @@ import os
 from celery import Celery
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cod_inventory.settings')
+# celery runs django's system checks at boot, which imports the whole URLconf
+# (views, DRF, simplejwt). manage.py check covers that, workers don't need it
+os.environ.setdefault('CELERY_SKIP_CHECKS', '1')
 
 app = Celery('cod_inventory')
 
@@ -21,6 +24,18 @@ app.conf.beat_schedule = {
         'task': 'inventory.tasks.generate_daily_stats',
         'schedule': crontab(hour=23, minute=55),  # Run daily at 11:55 PM
     },
+    'recompute-player-levels': {
+        'task': 'inventory.tasks.recompute_player_levels',
+        'schedule': crontab(hour=3, minute=0),  # catches trades and level rule changes, purchases level up at once
+    },
+    'snapshot-arsenal-values': {
+        'task': 'inventory.tasks.snapshot_arsenal_values',
+        'schedule': crontab(hour=0, minute=10),  # one point per player per day
+    },
+    'refresh-catalog-analytics': {
+        'task': 'inventory.tasks.refresh_catalog_analytics',
+        'schedule': crontab(minute='*/5'),  # incremental, only what changed since last run
+    },
 }
 
 app.conf.timezone = 'UTC'
@@ -75,6 +75,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # sqlite has no row locks, take the write lock at BEGIN so atomic
+            # blocks (purchases, trades) queue up instead of failing to upgrade
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -122,6 +128,34 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 
+# Cache
+# shared by every worker, the bot and celery: idempotency keys and their locks,
+# inventory versions and rendered bot pages only work if all of them see the
+# same store. Same redis as celery by default. CACHE_URL= (empty) falls
+# back to per process memory, only fit for a single process (runserver, tests).
+
+CACHE_URL = config('CACHE_URL', default=config('REDIS_URL', default='redis://localhost:6379/0'))
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# catalog changes are announced here so every worker swaps its in-process
+# snapshot right away (inventory/snapshot.py), empty = poll the version instead
+CATALOG_PUBSUB_URL = config('CATALOG_PUBSUB_URL', default=CACHE_URL)
+
+
+
 # drf settings 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -132,9 +166,28 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 19
+    'PAGE_SIZE': 19,
+    # sliding window limits shared through redis, see inventory/throttling.py
+    'DEFAULT_THROTTLE_CLASSES': [
+        'inventory.throttling.DefaultThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '120/min',
+        'user': '600/min',
+        'auth': '10/min',
+        'inventory_write': '30/min',
+    },
 }
 
+# weapon list / profile / inventory answer json clients without DRF serializers,
+# bench_serializers checks both paths return the same bytes
+FAST_JSON_RESPONSES = True
+
+# serve health / weapons / profile / inventory from async views, on by default under asgi.py
+ASYNC_API_VIEWS = config('ASYNC_API_VIEWS', default=False, cast=bool)
+
+THROTTLE_REDIS_URL = config('THROTTLE_REDIS_URL', default=config('REDIS_URL', default='redis://localhost:6379/0'))
+
 
 # jwt settings 
 from datetime import timedelta
@@ -156,6 +209,29 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# one queue per workload so an email burst can't hold up maintenance or stats,
+# start a worker per queue: celery -A cod_inventory worker -Q email
+from kombu import Queue
+
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_QUEUES = (
+    Queue('default'),
+    Queue('email'),
+    Queue('maintenance'),
+    Queue('analytics'),
+)
+CELERY_TASK_ROUTES = {
+    'inventory.tasks.send_welcome_email': {'queue': 'email'},
+    'inventory.tasks.send_weapon_purchase_confirmation': {'queue': 'email'},
+    'inventory.tasks.cleanup_old_sessions': {'queue': 'maintenance'},
+    'inventory.tasks.recompute_player_levels': {'queue': 'maintenance'},
+    'inventory.tasks.generate_daily_stats': {'queue': 'analytics'},
+    'inventory.tasks.refresh_catalog_analytics': {'queue': 'analytics'},
+    'inventory.tasks.snapshot_arsenal_values': {'queue': 'analytics'},
+}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # tasks are uneven, don't let one worker hoard them
+CELERY_RESULT_EXPIRES = timedelta(hours=1)
+
 
 
 # email settings
@@ -169,8 +245,24 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 
+# startup budgets per entry point, checked by: manage.py startup_profile --check
+STARTUP_BUDGETS_MS = {
+    'wsgi': 800,
+    'asgi': 800,
+    'web-first-request': 1500,
+    'celery': 1200,
+    'bot': 1200,
+}
+
+
 # tele bot 
 TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
+TELEGRAM_API_BASE_URL = config('TELEGRAM_API_BASE_URL', default='https://api.telegram.org/bot')  # point at a fake Bot API for tests
+
+# broadcast limits, telegram allows ~30 msg/s overall and ~1 msg/s per chat
+TELEGRAM_BROADCAST_RATE = 30
+TELEGRAM_BROADCAST_CHAT_INTERVAL = 1.0
+TELEGRAM_BROADCAST_CHUNK_SIZE = 500
 
 
 # security settings
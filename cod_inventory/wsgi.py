@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cod_inventory.settings')
 
 application = get_wsgi_application()
+
+# weapon catalog snapshot, built in the background so boot stays fast
+from inventory import snapshot  # noqa: E402
+
+snapshot.start()
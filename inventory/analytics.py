@@ -0,0 +1,169 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import (
+    Player, PlayerWeapon, AnalyticsChange, WeaponPopularity,
+    OwnershipStat, PlayerArsenalValue, LevelArsenalStat
+)
+
+
+BATCH_SIZE = 1000
+
+
+def record_change(player_id=None, weapon_id=None):
+    AnalyticsChange.objects.create(player_id=player_id, weapon_id=weapon_id)
+
+
+def _chunks(values, size=BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _refresh_popularity(weapon_ids):
+    """
+    Recount owners and quantity for the given weapons (None = every weapon)
+    """
+    if weapon_ids is None:
+        WeaponPopularity.objects.all().delete()
+        batches = [None]
+    else:
+        batches = _chunks(weapon_ids)
+
+    for batch in batches:
+        owned = PlayerWeapon.objects.order_by()
+        if batch is not None:
+            owned = owned.filter(weapon_id__in=batch)
+
+        counts = {
+            row['weapon_id']: row
+            for row in owned.values('weapon_id').annotate(owners=Count('id'), total=Sum('quantity'))
+        }
+        rows = [
+            WeaponPopularity(weapon_id=row['weapon_id'], owners=row['owners'], total_quantity=row['total'])
+            for row in counts.values()
+        ]
+        WeaponPopularity.objects.bulk_create(
+            rows,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['weapon'],
+            update_fields=['owners', 'total_quantity'],
+        )
+        if batch is not None:
+            WeaponPopularity.objects.filter(weapon_id__in=set(batch) - set(counts)).delete()
+
+
+def _refresh_ownership():
+    # rebuilt from WeaponPopularity, which has at most one row per catalog weapon
+    grouped = (
+        WeaponPopularity.objects.order_by()
+        .values(rarity=F('weapon__rarity'), weapon_type=F('weapon__weapon_type'))
+        .annotate(owners=Sum('owners'), total=Sum('total_quantity'))
+    )
+    rows = [
+        OwnershipStat(
+            rarity=row['rarity'], weapon_type=row['weapon_type'],
+            owners=row['owners'], total_quantity=row['total'],
+        )
+        for row in grouped
+    ]
+    OwnershipStat.objects.all().delete()
+    OwnershipStat.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def _refresh_player_values(player_ids):
+    """
+    Recompute arsenal value for the given players (None = every player).
+    Returns the set of levels whose totals may have moved.
+    """
+    touched_levels = set()
+    if player_ids is None:
+        PlayerArsenalValue.objects.all().delete()
+        LevelArsenalStat.objects.all().delete()
+        player_ids = Player.objects.order_by('id').values_list('id', flat=True).iterator()
+
+    for batch in _chunks(player_ids):
+        old_levels = dict(
+            PlayerArsenalValue.objects.filter(player_id__in=batch).values_list('player_id', 'level')
+        )
+        levels = dict(Player.objects.filter(id__in=batch).values_list('id', 'level'))
+        values = dict(
+            PlayerWeapon.objects.order_by()
+            .filter(player_id__in=batch)
+            .values('player_id')
+            .annotate(value=Sum(F('quantity') * F('weapon__price')))
+            .values_list('player_id', 'value')
+        )
+
+        touched_levels.update(old_levels.values())
+        touched_levels.update(levels.values())
+
+        PlayerArsenalValue.objects.filter(player_id__in=set(batch) - set(levels)).delete()
+        PlayerArsenalValue.objects.bulk_create(
+            [
+                PlayerArsenalValue(player_id=player_id, level=level, value=values.get(player_id) or 0.0)
+                for player_id, level in levels.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['player_id'],
+            update_fields=['level', 'value'],
+        )
+    return touched_levels
+
+
+def _refresh_levels(levels):
+    grouped = {
+        row['level']: row
+        for row in PlayerArsenalValue.objects.order_by()
+        .filter(level__in=levels)
+        .values('level')
+        .annotate(players=Count('player_id'), total=Sum('value'))
+    }
+    LevelArsenalStat.objects.filter(level__in=set(levels) - set(grouped)).delete()
+    LevelArsenalStat.objects.bulk_create(
+        [
+            LevelArsenalStat(level=level, players=row['players'], total_value=row['total'] or 0.0)
+            for level, row in grouped.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['level'],
+        update_fields=['players', 'total_value'],
+    )
+
+
+def refresh_analytics(full=False):
+    """
+    Bring the materialized analytics tables up to date.
+
+    Only weapons and players named in the change log since the last run are
+    recounted. The first run, or full=True, rebuilds everything.
+    """
+    last_change = AnalyticsChange.objects.order_by('-id').values_list('id', flat=True).first()
+    full = full or not (LevelArsenalStat.objects.exists() or WeaponPopularity.objects.exists())
+
+    with transaction.atomic():
+        if full:
+            _refresh_popularity(None)
+            _refresh_ownership()
+            levels = _refresh_player_values(None)
+            _refresh_levels(levels)
+        elif last_change is not None:
+            changes = AnalyticsChange.objects.filter(id__lte=last_change)
+            weapon_ids = set(changes.exclude(weapon_id=None).values_list('weapon_id', flat=True).distinct())
+            player_ids = set(changes.exclude(player_id=None).values_list('player_id', flat=True).distinct())
+
+            # a weapon edit (price) changes the value of every arsenal that holds it
+            repriced = changes.filter(player_id=None).exclude(weapon_id=None).values_list('weapon_id', flat=True)
+            player_ids.update(
+                PlayerWeapon.objects.filter(weapon_id__in=repriced).values_list('player_id', flat=True).distinct()
+            )
+
+            _refresh_popularity(weapon_ids)
+            _refresh_ownership()
+            _refresh_levels(_refresh_player_values(player_ids))
+
+        if last_change is not None:
+            AnalyticsChange.objects.filter(id__lte=last_change).delete()
+
+    return {'full': full, 'changes': last_change is not None}
@@ -0,0 +1,192 @@
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import Player, Weapon, PlayerWeapon
+from .throttling import DefaultThrottle, get_limiter
+from . import fast_json
+from . import views
+
+
+# Async versions of the hot read endpoints, used when ASYNC_API_VIEWS is on
+# (asgi.py turns it on). They answer the common case - a json client with a
+# good token - on the event loop with the async ORM. Anything else (browsable
+# api, bad tokens, throttled, bad page numbers, POSTs) is handed to the normal
+# DRF view so errors come out exactly the same.
+
+
+class Fallback(Exception):
+    pass
+
+
+# with the blacklist app installed validating a token hits the database
+_TOKEN_NEEDS_DB = apps.is_installed('rest_framework_simplejwt.token_blacklist')
+
+
+async def authenticate(request):
+    """
+    Same result as JWTAuthentication then SessionAuthentication, for the
+    requests they accept. Raises Fallback for the ones they would reject.
+    """
+    jwt = JWTAuthentication()
+    header = jwt.get_header(request)
+    if header is not None:
+        try:
+            raw_token = jwt.get_raw_token(header)
+            if raw_token is None:
+                raise Fallback
+            if _TOKEN_NEEDS_DB:
+                token = await sync_to_async(jwt.get_validated_token)(raw_token)
+            else:
+                token = jwt.get_validated_token(raw_token)
+            user_id = token[jwt_settings.USER_ID_CLAIM]
+            user = await Player.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+        except (exceptions.APIException, TokenError, KeyError, Player.DoesNotExist):
+            raise Fallback
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise Fallback
+        if jwt_settings.CHECK_REVOKE_TOKEN:
+            raise Fallback
+        return user
+
+    # session cookie, csrf isn't checked for GETs
+    user = await request.auser()
+    if user.is_authenticated and user.is_active:
+        return user
+    return AnonymousUser()
+
+
+def wants_fast_json(request):
+    if not getattr(settings, 'FAST_JSON_RESPONSES', True):
+        return False
+    renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+    try:
+        renderer, _ = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS().select_renderer(Request(request), renderers)
+    except exceptions.NotAcceptable:
+        return False
+    return renderer.format == 'json'
+
+
+async def check_throttle(request):
+    throttle = DefaultThrottle()
+    if get_limiter().redis is None:
+        allowed = throttle.allow_request(request, None)
+    else:
+        # redis round trip, keep it off the event loop
+        allowed = await sync_to_async(throttle.allow_request, thread_sensitive=False)(request, None)
+    if not allowed:
+        # not counted again, the DRF view builds the 429 with Retry-After
+        raise Fallback
+
+
+def async_read_view(sync_view, login_required=True, prepare=None):
+    """
+    Wrap an async handler so every request it can't answer goes to `sync_view`.
+
+    `prepare(request)` runs before the throttle and returns extra handler
+    kwargs. Anything that may still raise Fallback belongs there, or the
+    request would be counted here and again by the DRF view.
+    """
+    fallback = sync_to_async(sync_view)
+
+    def decorator(handler):
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET' or not wants_fast_json(request):
+                return await fallback(request, *args, **kwargs)
+            try:
+                request.user = await authenticate(request)
+                if login_required and not request.user.is_authenticated:
+                    raise Fallback
+                prepared = await prepare(request) if prepare else {}
+                await check_throttle(request)
+                return await handler(request, *args, **kwargs, **prepared)
+            except Fallback:
+                return await fallback(request, *args, **kwargs)
+
+        view.__name__ = handler.__name__
+        view.__doc__ = handler.__doc__
+        # like APIView.as_view(), csrf is left to SessionAuthentication so
+        # token authenticated writes handed to the DRF view aren't rejected
+        view.csrf_exempt = True
+        return view
+
+    return decorator
+
+
+# weapon list, GET only, creating weapons stays on the DRF view
+
+async def weapon_page(request):
+    count = await Weapon.objects.acount()
+    num_pages = max(1, -(-count // api_settings.PAGE_SIZE))
+
+    # same page numbers PageNumberPagination accepts, odd ones get its 404
+    page_number = request.GET.get('page') or '1'
+    if page_number == 'last':
+        page_number = num_pages
+    elif page_number.isdigit():
+        page_number = int(page_number)
+    else:
+        raise Fallback
+    if not 1 <= page_number <= num_pages:
+        raise Fallback
+    return {'count': count, 'page_number': page_number, 'num_pages': num_pages}
+
+
+@async_read_view(views.WeaponListView.as_view(), prepare=weapon_page)
+async def weapon_list(request, count, page_number, num_pages):
+    page_size = api_settings.PAGE_SIZE
+    offset = (page_number - 1) * page_size
+    rows = [row async for row in Weapon.objects.values_list(*fast_json.WEAPON_FIELDS)[offset:offset + page_size]]
+    data, floats = fast_json.weapon_dicts(rows)
+
+    url = request.build_absolute_uri()
+    next_link = replace_query_param(url, 'page', page_number + 1) if page_number < num_pages else None
+    if page_number == 1:
+        previous_link = None
+    elif page_number == 2:
+        previous_link = remove_query_param(url, 'page')
+    else:
+        previous_link = replace_query_param(url, 'page', page_number - 1)
+
+    return fast_json.json_response({
+        'count': count,
+        'next': next_link,
+        'previous': previous_link,
+        'results': data,
+    }, floats)
+
+
+@async_read_view(views.player_profile)
+async def player_profile(request):
+    data = fast_json.player_dict(request.user, await request.user.weapons.acount())
+    return fast_json.json_response(data, [data['cash']])
+
+
+@async_read_view(views.player_inventory)
+async def player_inventory(request):
+    inventory = PlayerWeapon.objects.filter(player=request.user).order_by('id')
+    rows = [row async for row in inventory.values_list(*fast_json.INVENTORY_FIELDS)]
+    data, floats = fast_json.inventory_dicts(request.user, rows)
+    return fast_json.json_response({
+        'player': request.user.username,
+        'total_weapons': len(rows),
+        'inventory': data
+    }, floats)
+
+
+@async_read_view(views.health_check, login_required=False)
+async def health_check(request):
+    return fast_json.json_response({
+        'status': 'healthy',
+        'message': 'COD Inventory API is running',
+        'total_weapons': await Weapon.objects.acount(),
+        'total_players': await Player.objects.acount()
+    })
@@ -0,0 +1,78 @@
+import logging
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import CatalogVersion
+
+logger = logging.getLogger(__name__)
+
+# one Weapon row as the fast json path, the snapshot and search read it, same
+# order as WeaponSerializer. Kept out of fast_json so workers that only need the
+# catalog don't import DRF's serializers at boot.
+WEAPON_FIELDS = ('id', 'name', 'weapon_type', 'damage', 'range', 'accuracy', 'rarity', 'price', 'created_at')
+
+
+def cache_is_shared():
+    """
+    False for the per process backends, nothing kept there reaches the other workers
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+# catalog version, one CatalogVersion row bumped on every Weapon write so the
+# per-process catalog snapshots know when to rebuild. In the database rather
+# than the cache, a per process cache would never tell the other workers.
+CATALOG_VERSION_ID = 1
+
+
+def get_catalog_version():
+    version = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('version', flat=True).first()
+    return version or 1
+
+
+def bump_catalog_version():
+    with transaction.atomic():
+        if not CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(version=F('version') + 1):
+            try:
+                # first change ever, readers have been seeing 1 so far
+                with transaction.atomic():
+                    CatalogVersion.objects.create(pk=CATALOG_VERSION_ID, version=2)
+            except IntegrityError:
+                # another process created it first
+                CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(version=F('version') + 1)
+        return CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('version', flat=True).get()
+
+
+# per-player inventory version, bumped on every PlayerWeapon write
+def _inventory_version_key(player_id):
+    return f'inventory:version:{player_id}'
+
+
+def get_inventory_version(player_id):
+    key = _inventory_version_key(player_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_inventory_version(player_id):
+    """
+    Call it once the change is committed. Only cached bot pages hang off this
+    version, so a cache outage is logged instead of failing the write.
+    """
+    key = _inventory_version_key(player_id)
+    try:
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, timeout=None)
+            return 2
+    except Exception as e:
+        logger.warning(f"Inventory version of player {player_id} not bumped, cached pages may be stale: {str(e)}")
+        return None
@@ -0,0 +1,128 @@
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .catalog import WEAPON_FIELDS  # noqa: F401, the field order WeaponSerializer has
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder gives the same bytes, just slower
+    orjson = None
+
+
+# field order has to match the ModelSerializers in serializers.py
+INVENTORY_FIELDS = ('id', 'weapon_id', 'weapon__name', 'quantity', 'acquired_at')
+
+# formats datetimes exactly like the serializers do
+_datetime = serializers.DateTimeField()
+
+
+def datetime_formatter():
+    """
+    Return a function formatting datetimes like DateTimeField.to_representation,
+    with the timezone lookups done once instead of once per value
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    if not settings.USE_TZ or output_format is None or output_format.lower() != ISO_8601:
+        return _datetime.to_representation
+
+    current = timezone.get_current_timezone()
+
+    def to_iso(value):
+        if not value or value.tzinfo is None:
+            return _datetime.to_representation(value)
+        try:
+            value = value.astimezone(current).isoformat()
+        except OverflowError:
+            return _datetime.to_representation(value)
+        if value.endswith('+00:00'):
+            return value[:-6] + 'Z'
+        return value
+
+    return to_iso
+
+
+def enabled(request):
+    return getattr(settings, 'FAST_JSON_RESPONSES', True) and request.accepted_renderer.format == 'json'
+
+
+def _float_is_safe(value):
+    # orjson writes 1e16 / 1e-05 as 1e16 / 0.00001, json writes 1e+16 / 1e-05, nan never matches
+    return value == 0 or 1e-4 <= abs(value) < 1e16
+
+
+def dumps(data, floats=()):
+    """
+    Encode `data` to the same bytes rest_framework's JSONRenderer produces.
+
+    `floats` are all float values inside `data`, orjson is only used when
+    every one of them prints the same way it does with the json module.
+    """
+    if orjson is not None and all(map(_float_is_safe, floats)):
+        try:
+            content = orjson.dumps(data)
+        except orjson.JSONEncodeError:
+            pass
+        else:
+            return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+    content = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    return content.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+def json_response(data, floats=()):
+    return HttpResponse(dumps(data, floats), content_type='application/json')
+
+
+def weapon_dicts(rows):
+    """
+    WEAPON_FIELDS tuples -> WeaponSerializer shaped dicts, plus their floats
+    """
+    to_datetime = datetime_formatter()
+    data = [
+        {
+            'id': pk, 'name': name, 'weapon_type': weapon_type, 'damage': damage,
+            'range': weapon_range, 'accuracy': accuracy, 'rarity': rarity, 'price': float(price),
+            'created_at': to_datetime(created_at),
+        }
+        for pk, name, weapon_type, damage, weapon_range, accuracy, rarity, price, created_at in rows
+    ]
+    return data, [row['price'] for row in data]
+
+
+def player_dict(player, weapon_count):
+    """
+    PlayerSerializer shaped dict for an already loaded player
+    """
+    return {
+        'id': player.id,
+        'username': player.username,
+        'email': player.email,
+        'telegram_username': player.telegram_username,
+        'telegram_chat_id': player.telegram_chat_id,
+        'level': player.level,
+        'cash': float(player.cash),
+        'created_at': datetime_formatter()(player.created_at),
+        'weapon_count': weapon_count,
+    }
+
+
+def inventory_dicts(player, rows):
+    """
+    INVENTORY_FIELDS tuples -> PlayerWeaponSerializer shaped dicts. Every row
+    embeds the same player, so it is built once.
+    """
+    owner = player_dict(player, len(rows))
+    to_datetime = datetime_formatter()
+    data = [
+        {
+            'id': pk, 'player': owner, 'weapon': weapon_id, 'Weapon_name': weapon_name,
+            'quantity': quantity, 'acquired_at': to_datetime(acquired_at),
+        }
+        for pk, weapon_id, weapon_name, quantity, acquired_at in rows
+    ]
+    return data, [owner['cash']]
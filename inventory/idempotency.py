@@ -0,0 +1,82 @@
+import functools
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+
+HEADER = 'Idempotency-Key'
+RESPONSE_TTL = 60 * 60 * 24
+# longest a request may hold the key before duplicates stop waiting for it
+LOCK_TTL = 30
+POLL_INTERVAL = 0.05
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method}:{request.path}:{body}'.encode()).hexdigest()
+
+
+def _replay(stored):
+    return Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view):
+    """
+    Let clients retry a write safely by sending an Idempotency-Key header.
+
+    The first response for a key is kept in the shared cache for a day and
+    replayed for every retry without running the view again. A duplicate that
+    arrives while the first request is still running waits for its result.
+    Server errors are not stored so those can be retried for real.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        # reads are safe to repeat anyway and must never be answered from a stored response
+        if not key or request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({'error': f'{HEADER} is too long'}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = f'idempotency:{request.user.pk}:{hashlib.sha256(key.encode()).hexdigest()}'
+        lock_key = f'{cache_key}:lock'
+        fingerprint = _fingerprint(request)
+
+        deadline = time.monotonic() + LOCK_TTL
+        while True:
+            stored = cache.get(cache_key)
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return Response(
+                        {'error': f'{HEADER} was already used for a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                return _replay(stored)
+
+            if cache.add(lock_key, fingerprint, timeout=LOCK_TTL):
+                break
+            if time.monotonic() >= deadline:
+                return Response(
+                    {'error': 'A request with this Idempotency-Key is still in progress'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code < 500:
+                cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, timeout=RESPONSE_TTL)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
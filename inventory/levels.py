@@ -0,0 +1,120 @@
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .models import Player, PlayerWeapon, AnalyticsChange
+
+
+# points per weapon owned, by rarity
+RARITY_POINTS = {
+    'common': 1,
+    'uncommon': 2,
+    'rare': 5,
+    'epic': 12,
+    'legendary': 30,
+}
+# plus one point per this many coins of arsenal value
+VALUE_PER_POINT = 100
+# level n needs POINTS_PER_LEVEL * (n - 1) ** 2 points, each level a bit further away
+POINTS_PER_LEVEL = 10
+MAX_LEVEL = 100
+
+# players per keyset chunk, one aggregate query and one update per new level each
+CHUNK_SIZE = 2000
+
+
+def level_for(rarity_points, value):
+    points = (rarity_points or 0) + (value or 0) / VALUE_PER_POINT
+    # negative quantities (and so negative points) are level 1, isqrt raises on them
+    points = max(points, 0)
+    return min(MAX_LEVEL, 1 + math.isqrt(int(points // POINTS_PER_LEVEL)))
+
+
+def _scores(owned):
+    """
+    {player_id: (rarity_points, value)} for a PlayerWeapon queryset, one query
+    """
+    rarity_points = Case(
+        *(When(weapon__rarity=rarity, then=Value(points)) for rarity, points in RARITY_POINTS.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return {
+        player_id: (points, value)
+        for player_id, points, value in owned.order_by()
+        .values('player_id')
+        .annotate(points=Sum(F('quantity') * rarity_points), value=Sum(F('quantity') * F('weapon__price')))
+        .values_list('player_id', 'points', 'value')
+    }
+
+
+def update_player_level(player):
+    """
+    Recompute one player's level right after their inventory grew. Levels only
+    go up, selling weapons doesn't take a level away. Returns True if it moved.
+    """
+    points, value = _scores(PlayerWeapon.objects.filter(player_id=player.pk)).get(player.pk, (0, 0))
+    level = level_for(points, value)
+    if level <= player.level:
+        return False
+    player.level = level
+    player.save(update_fields=['level'])
+    return True
+
+
+def recompute_levels(after_id=0, max_chunks=None, chunk_size=CHUNK_SIZE):
+    """
+    Recompute levels for players with id > after_id, walking the table in id
+    order one chunk at a time. Stops after `max_chunks` chunks (None = the end).
+
+    Returns (last_id, scanned, changed), last_id is None once every player was seen.
+    """
+    scanned = changed = chunks = 0
+
+    while max_chunks is None or chunks < max_chunks:
+        # keyset page, stays fast however deep into the table we are
+        players = list(
+            Player.objects.filter(id__gt=after_id).order_by('id').values_list('id', 'level')[:chunk_size]
+        )
+        if not players:
+            return None, scanned, changed
+
+        first_id, last_id = players[0][0], players[-1][0]
+        scores = _scores(PlayerWeapon.objects.filter(player_id__gte=first_id, player_id__lte=last_id))
+
+        levels = {}
+        for player_id, current in players:
+            level = level_for(*scores.get(player_id, (0, 0)))
+            if level > current:
+                levels[player_id] = level
+
+        updated = []
+        if levels:
+            with transaction.atomic():
+                # locked in id order like trades do, a purchase may have raised some meanwhile
+                current = dict(
+                    Player.objects.select_for_update().filter(id__in=levels).order_by('id').values_list('id', 'level')
+                )
+                by_level = defaultdict(list)
+                for player_id, level in levels.items():
+                    if level > current.get(player_id, level):
+                        by_level[level].append(player_id)
+
+                # one UPDATE per new level instead of bulk_update's CASE per row
+                for level, ids in by_level.items():
+                    Player.objects.filter(id__in=ids).update(level=level)
+                    updated += ids
+                # .update() skips the signals, levels feed the arsenal analytics
+                AnalyticsChange.objects.bulk_create([AnalyticsChange(player_id=player_id) for player_id in updated])
+
+        scanned += len(players)
+        changed += len(updated)
+        chunks += 1
+        after_id = last_id
+
+        if len(players) < chunk_size:
+            return None, scanned, changed
+
+    return after_id, scanned, changed
@@ -0,0 +1,256 @@
+import heapq
+import threading
+
+import numpy as np
+
+from .models import Weapon
+from .snapshot import get_snapshot
+
+
+STATS = ('damage', 'range', 'accuracy')
+WEAPON_TYPES = [code for code, _ in Weapon.WEAPON_TYPES]
+
+# width of the knapsack table. Prices go in as whole cents (divided by their
+# common factor) while the budget is at most this many of those, exact then.
+# Bigger budgets are split into this many units with every price rounded up.
+BUDGET_STEPS = 20000
+
+DEFAULT_SLOTS = 1
+
+# lowest scaled stat, the weakest weapon still scores something and gets picked
+# when it is all that fits
+STAT_FLOOR = 0.05
+
+
+class CatalogMatrix:
+    """
+    Whole weapon catalog packed into numpy arrays, one row per weapon
+    """
+
+    def __init__(self, version, ids, type_codes, prices, stats):
+        self.version = version
+        self.ids = ids
+        self.type_codes = type_codes
+        self.prices = prices
+        self.stats = stats
+
+    @classmethod
+    def build(cls, snapshot):
+        rows = [
+            (weapon.id, weapon.weapon_type, weapon.price, *(getattr(weapon, stat) for stat in STATS))
+            for weapon in snapshot.records
+        ]
+        type_index = {code: i for i, code in enumerate(WEAPON_TYPES)}
+
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        type_codes = np.fromiter(
+            (type_index.get(r[1], -1) for r in rows), dtype=np.int8, count=len(rows)
+        )
+        prices = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+        stats = np.array([r[3:] for r in rows], dtype=np.float32).reshape(len(rows), len(STATS))
+
+        # min-max scale every stat to STAT_FLOOR..1 so the weights are comparable
+        if len(rows):
+            low = stats.min(axis=0)
+            spread = stats.max(axis=0) - low
+            spread[spread == 0] = 1
+            stats = STAT_FLOOR + (1 - STAT_FLOOR) * (stats - low) / spread
+
+        return cls(snapshot.version, ids, type_codes, prices, stats)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def get_catalog_matrix():
+    """
+    Return the cached catalog matrix, rebuilt from the catalog snapshot when that moved on
+    """
+    global _matrix
+    snapshot = get_snapshot()
+    matrix = _matrix
+    if matrix is not None and matrix.version == snapshot.version:
+        return matrix
+
+    with _matrix_lock:
+        if _matrix is None or _matrix.version != snapshot.version:
+            _matrix = CatalogMatrix.build(snapshot)
+        return _matrix
+
+
+def _candidates(costs, scores, slots):
+    """
+    Drop weapons that can never be in an optimal pick of `slots` items:
+    anything with at least `slots` weapons that are both cheaper and better.
+    """
+    if len(costs) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # best score first inside every cost bucket, cheapest bucket first
+    order = np.lexsort((-scores, costs))
+    costs, scores = costs[order], scores[order]
+
+    # inside one bucket only the top `slots` scores can matter
+    first = np.r_[True, costs[1:] != costs[:-1]]
+    bucket_start = np.maximum.accumulate(np.where(first, np.arange(len(costs)), 0))
+    rank = np.arange(len(costs)) - bucket_start
+    keep = np.flatnonzero(rank < slots)
+
+    best = []
+    picked = []
+    for i in keep:
+        score = scores[i]
+        if len(best) < slots:
+            heapq.heappush(best, score)
+        elif score > best[0]:
+            heapq.heapreplace(best, score)
+        else:
+            continue
+        picked.append(i)
+    return order[np.asarray(picked, dtype=np.int64)]
+
+
+def _costs(prices, affordable, budget):
+    """
+    Integer knapsack costs for every weapon, (costs, steps in the budget, exact?)
+    """
+    # rounded up, so a picked loadout never goes over the real budget
+    cents = np.ceil(prices * 100 - 1e-6).astype(np.int64)
+    cents[cents < 0] = 0
+    step = int(np.gcd.reduce(cents[affordable])) if affordable.any() else 0
+    step = step or 1
+    steps = int(budget * 100 + 1e-6) // step
+    if steps <= BUDGET_STEPS:
+        return cents // step, steps, True
+
+    unit = budget / BUDGET_STEPS
+    costs = np.ceil(prices / unit - 1e-9).astype(np.int64)
+    costs[costs < 0] = 0
+    return costs, BUDGET_STEPS, False
+
+
+def _improve(picked, matrix, scores, affordable, budget, slots):
+    """
+    Coarse units round every price up and may leave real coins unspent. Spend
+    them on the best extra weapon or same type upgrade, one at a time, until
+    neither fits any more.
+    """
+    picked = list(picked)
+    while True:
+        taken = np.zeros(len(matrix), dtype=bool)
+        taken[picked] = True
+        left = budget - matrix.prices[picked].sum()
+        open_rows = affordable & ~taken
+
+        best_gain, move = 1e-9, None
+        for type_code, weapon_type in enumerate(WEAPON_TYPES):
+            of_type = open_rows & (matrix.type_codes == type_code)
+            if not of_type.any():
+                continue
+            mine = [row for row in picked if matrix.type_codes[row] == type_code]
+
+            if len(mine) < int(slots.get(weapon_type, DEFAULT_SLOTS)):
+                fits = np.flatnonzero(of_type & (matrix.prices <= left + 1e-9))
+                if len(fits):
+                    row = fits[np.argmax(scores[fits])]
+                    if scores[row] > best_gain:
+                        best_gain, move = scores[row], (None, row)
+
+            for old in mine:
+                fits = np.flatnonzero(of_type & (matrix.prices <= left + matrix.prices[old] + 1e-9))
+                if len(fits):
+                    row = fits[np.argmax(scores[fits])]
+                    if scores[row] - scores[old] > best_gain:
+                        best_gain, move = scores[row] - scores[old], (old, row)
+
+        if move is None:
+            return picked
+        old, new = move
+        if old is not None:
+            picked.remove(old)
+        picked.append(new)
+
+
+def optimize_loadout(budget, weights=None, slots=None):
+    """
+    Pick the best scoring set of weapons that fits into `budget`.
+
+    `weights` maps stat name -> weight, `slots` maps weapon_type -> how many
+    weapons of that type the loadout may hold. Every weapon is taken at most
+    once. Returns (weapon_ids, total_price, total_score).
+    """
+    weights = weights or {}
+    slots = slots or {}
+
+    matrix = get_catalog_matrix()
+    if budget <= 0 or not len(matrix):
+        return [], 0.0, 0.0
+
+    weight_vector = np.array([weights.get(stat, 1.0) for stat in STATS], dtype=np.float32)
+    scores = matrix.stats @ weight_vector
+
+    # only zero weights make a score 0, those stats don't count at all
+    affordable = (matrix.prices <= budget) & (scores > 0)
+    costs, steps, exact = _costs(matrix.prices, affordable, budget)
+    affordable &= costs <= steps
+
+    best = np.full(steps + 1, -np.inf)
+    best[0] = 0.0
+    history = []
+
+    for type_code, weapon_type in enumerate(WEAPON_TYPES):
+        type_slots = int(slots.get(weapon_type, DEFAULT_SLOTS))
+        if type_slots <= 0:
+            continue
+
+        rows = np.flatnonzero(affordable & (matrix.type_codes == type_code))
+        rows = rows[_candidates(costs[rows], scores[rows], type_slots)]
+        if not len(rows):
+            continue
+
+        # table[c, b] = best score using c weapons of this type at total cost b
+        table = np.full((type_slots + 1, steps + 1), -np.inf)
+        table[0] = best
+        takes = []
+        for row in rows:
+            cost, score = costs[row], scores[row]
+            candidate = np.full_like(table, -np.inf)
+            if cost == 0:
+                candidate[1:] = table[:-1] + score
+            else:
+                candidate[1:, cost:] = table[:-1, :-cost] + score
+            take = candidate > table
+            table = np.where(take, candidate, table)
+            takes.append(take)
+
+        best = table.max(axis=0)
+        history.append((rows, takes, table))
+
+    end = int(np.argmax(best))
+    if not np.isfinite(best[end]) or best[end] <= 0:
+        return [], 0.0, 0.0
+
+    # walk the choices back from the best end state
+    picked = []
+    b = end
+    for rows, takes, table in reversed(history):
+        c = int(np.argmax(table[:, b]))
+        for row, take in zip(reversed(rows), reversed(takes)):
+            if c and take[c, b]:
+                picked.append(row)
+                c -= 1
+                b -= costs[row]
+
+    if not exact:
+        picked = _improve(picked, matrix, scores, affordable, budget, slots)
+
+    picked = np.asarray(picked, dtype=np.int64)
+    return (
+        matrix.ids[picked].tolist(),
+        float(matrix.prices[picked].sum()),
+        float(scores[picked].sum()),
+    )
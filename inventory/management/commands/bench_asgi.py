@@ -0,0 +1,140 @@
+import asyncio
+import importlib.util
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from inventory.models import Player
+
+try:
+    import httpx
+except ImportError:  # comes with python-telegram-bot
+    httpx = None
+
+
+# (server module, command line, ASYNC_API_VIEWS)
+SERVERS = {
+    'wsgi': ('gunicorn', [
+        '-m', 'gunicorn', 'cod_inventory.wsgi', '--bind', '{host}:{port}', '--workers', '{workers}',
+        '--threads', '{threads}', '--backlog', '4096', '--log-level', 'warning',
+    ], 'False'),
+    'asgi': ('uvicorn', [
+        '-m', 'uvicorn', 'cod_inventory.asgi:application', '--host', '{host}', '--port', '{port}',
+        '--workers', '{workers}', '--backlog', '4096', '--log-level', 'warning', '--no-access-log',
+    ], 'True'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the app under gunicorn (WSGI, sync views) and uvicorn (ASGI, async '
+        'views) in turn and hit one endpoint from many simultaneous clients, '
+        'reporting requests per second and latency for each.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000, help='simultaneous connections')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--path', default='/api/profile/')
+        parser.add_argument('--workers', type=int, default=2, help='server processes')
+        parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        if httpx is None:
+            raise CommandError('httpx is needed to generate load')
+        self.raise_file_limit(options['clients'] * 2 + 100)
+
+        # one player per client, the per user throttle would stop a single one
+        headers = [
+            {'Authorization': f'Bearer {AccessToken.for_user(player)}', 'Accept': 'application/json'}
+            for player in self.seed(options['clients'])
+        ]
+
+        for name, (module, argv, async_views) in SERVERS.items():
+            if importlib.util.find_spec(module) is None:
+                self.stderr.write(f"{name}: {module} not installed, skipped")
+                continue
+
+            command = [sys.executable] + [part.format(**options) for part in argv]
+            env = dict(os.environ, ASYNC_API_VIEWS=async_views)
+            server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+            try:
+                url = f"http://{options['host']}:{options['port']}{options['path']}"
+                self.wait_until_up(url, headers[0])
+                result = asyncio.run(self.load(url, headers, options['seconds']))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            self.report(name, options['clients'], result)
+
+    def seed(self, count):
+        existing = set(Player.objects.filter(username__startswith='bench_client_').values_list('username', flat=True))
+        Player.objects.bulk_create([
+            Player(username=f'bench_client_{i}', password='!')
+            for i in range(count) if f'bench_client_{i}' not in existing
+        ])
+        return Player.objects.filter(username__startswith='bench_client_').order_by('id')[:count]
+
+    def raise_file_limit(self, needed):
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY and soft < needed:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard) if hard != resource.RLIM_INFINITY else needed, hard))
+
+    def wait_until_up(self, url, headers, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(url, headers=headers, timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'Server did not answer 200 on {url} within {timeout}s')
+
+    async def load(self, url, headers, seconds):
+        limits = httpx.Limits(max_connections=len(headers), max_keepalive_connections=len(headers))
+        latencies, failures = [], {}
+        deadline = time.monotonic() + seconds
+
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            async def run_client(client_headers):
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.get(url, headers=client_headers)
+                        outcome = response.status_code
+                    except httpx.HTTPError as e:
+                        outcome = type(e).__name__
+                    if outcome == 200:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        failures[outcome] = failures.get(outcome, 0) + 1
+
+            started = time.monotonic()
+            await asyncio.gather(*(run_client(client_headers) for client_headers in headers))
+            elapsed = time.monotonic() - started
+
+        return sorted(latencies), failures, elapsed
+
+    def report(self, name, clients, result):
+        latencies, failures, elapsed = result
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f"{name}: no successful requests, failures: {failures}"))
+            return
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(
+            f"{name}: {clients} clients | {len(latencies) / elapsed:8.0f} req/s | "
+            f"p50 {percentile(0.5):7.1f} ms | p99 {percentile(0.99):7.1f} ms | "
+            f"failed {sum(failures.values())} {failures or ''}"
+        )
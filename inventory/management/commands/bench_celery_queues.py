@@ -0,0 +1,95 @@
+import statistics
+import threading
+import time
+from contextlib import ExitStack
+
+from celery import Celery
+from celery.contrib.testing.worker import start_worker
+from kombu import Queue
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark task throughput and queue isolation: a burst of email tasks '
+        'followed by maintenance tasks, once on a shared queue and once routed '
+        'to dedicated queues like CELERY_TASK_ROUTES does.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--broker', default=settings.CELERY_BROKER_URL,
+                            help='broker url, memory:// runs without redis')
+        parser.add_argument('--emails', type=int, default=300)
+        parser.add_argument('--maintenance', type=int, default=20)
+        parser.add_argument('--email-cost', type=float, default=0.005,
+                            help='seconds each fake email task sleeps')
+
+    def handle(self, *args, **options):
+        for scenario in ('shared', 'isolated'):
+            result = self.run_scenario(scenario, options)
+            self.stdout.write(
+                f"{scenario:>8}: {result['throughput']:8.1f} tasks/s | "
+                f"maintenance latency p50 {result['p50'] * 1000:8.1f} ms, "
+                f"max {result['max'] * 1000:8.1f} ms"
+            )
+
+    def run_scenario(self, scenario, options):
+        done = {}
+        lock = threading.Lock()
+
+        app = Celery(f'bench_{scenario}', broker=options['broker'])
+        app.conf.update(
+            # fresh Queue objects, kombu binds them to the first app's channel
+            task_queues=[Queue(queue.name) for queue in settings.CELERY_TASK_QUEUES],
+            task_default_queue=settings.CELERY_TASK_DEFAULT_QUEUE,
+            worker_prefetch_multiplier=settings.CELERY_WORKER_PREFETCH_MULTIPLIER,
+            task_ignore_result=True,
+            worker_hijack_root_logger=False,
+            broker_transport_options={'polling_interval': 0.01},
+        )
+        if scenario == 'isolated':
+            app.conf.task_routes = {
+                'bench.email': {'queue': 'email'},
+                'bench.maintenance': {'queue': 'maintenance'},
+            }
+            worker_queues = [['email'], ['maintenance']]
+        else:
+            worker_queues = [['default'], ['default']]
+
+        @app.task(name='bench.email', shared=False)
+        def email(task_id, sent_at):
+            time.sleep(options['email_cost'])
+            with lock:
+                done[task_id] = time.perf_counter() - sent_at
+
+        @app.task(name='bench.maintenance', shared=False)
+        def maintenance(task_id, sent_at):
+            with lock:
+                done[task_id] = time.perf_counter() - sent_at
+
+        total = options['emails'] + options['maintenance']
+        with ExitStack() as stack:
+            # same worker count in both scenarios, only the routing differs
+            for i, queues in enumerate(worker_queues):
+                stack.enter_context(start_worker(
+                    app, pool='solo', perform_ping_check=False,
+                    hostname=f'bench-{scenario}-{i}@localhost', queues=queues,
+                ))
+
+            started = time.perf_counter()
+            for i in range(options['emails']):
+                email.delay(f'e{i}', time.perf_counter())
+            for i in range(options['maintenance']):
+                maintenance.delay(f'm{i}', time.perf_counter())
+
+            while len(done) < total:
+                time.sleep(0.01)
+            elapsed = time.perf_counter() - started
+
+        latencies = [v for k, v in done.items() if k.startswith('m')] or [0.0]
+        return {
+            'throughput': total / elapsed,
+            'p50': statistics.median(latencies),
+            'max': max(latencies),
+        }
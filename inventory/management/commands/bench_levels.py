@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.levels import CHUNK_SIZE, recompute_levels
+from inventory.models import Player, Weapon, PlayerWeapon
+
+PREFIX = 'bench_level_'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed --players players with random inventories (once, named bench_level_*), '
+        'reset their levels and time one full level pass over the players table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=100000)
+        parser.add_argument('--weapons-per-player', type=int, default=5)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        weapon_ids = list(Weapon.objects.values_list('id', flat=True))
+        if not weapon_ids:
+            raise CommandError('Needs weapons in the database (manage.py load_weapons)')
+
+        self.seed(options['players'], options['weapons_per_player'], weapon_ids)
+        Player.objects.filter(username__startswith=PREFIX).update(level=1)
+
+        total = Player.objects.count()
+        started = time.perf_counter()
+        _, scanned, changed = recompute_levels(chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+
+        rate = scanned / elapsed
+        self.stdout.write(
+            f"{scanned} players ({total} in table) in {elapsed:.1f}s: {rate:.0f} players/s, "
+            f"{changed} levelled up, ~{1_000_000 / rate / 60:.1f} min per million players"
+        )
+
+    def seed(self, count, per_player, weapon_ids):
+        existing = Player.objects.filter(username__startswith=PREFIX).count()
+        if existing >= count:
+            return
+
+        self.stdout.write(f"seeding {count - existing} players...")
+        rng = random.Random(38)
+        for start in range(existing, count, 10000):
+            players = Player.objects.bulk_create([
+                Player(username=f'{PREFIX}{i}', password='!')
+                for i in range(start, min(start + 10000, count))
+            ])
+            # bulk_create only returns ids on databases that support it, fetch them back
+            ids = Player.objects.filter(username__in=[p.username for p in players]).values_list('id', flat=True)
+            PlayerWeapon.objects.bulk_create([
+                PlayerWeapon(player_id=player_id, weapon_id=weapon_id, quantity=rng.randint(1, 5))
+                for player_id in ids
+                for weapon_id in rng.sample(weapon_ids, rng.randint(0, per_player * 2))
+            ], batch_size=5000)
@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.models import Weapon
+from inventory.search import search_weapons
+from inventory.snapshot import catalog_changed
+
+MODELS = [
+    'AK-47', 'AK-74', 'AKM', 'M4A1', 'M16', 'FAMAS', 'Barrett M82', 'AWP', 'Kar98k', 'MP5',
+    'UMP45', 'Vector', 'M249', 'PKM', 'M1014', 'Remington 870', 'Glock 18', 'Desert Eagle',
+    'RPG-7', 'Combat Knife',
+]
+VARIANTS = ['Custom', 'Tactical', 'Gold', 'Arctic', 'Urban', 'Elite', 'Mk II', 'Stealth', 'Veteran', 'Prototype']
+QUERIES = ['ak', 'AK-74', 'barrett', 'barr', 'm4', 'desert eagle', 'gold', 'glock 18 arctic', 'mk ii', 'vec']
+
+
+class Command(BaseCommand):
+    help = (
+        'Grow the catalog to --weapons weapons (extra ones named bench_search_*), '
+        'then compare search latency through the index with a name__icontains scan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weapons', type=int, default=100000)
+        parser.add_argument('--runs', type=int, default=20, help='runs per query')
+
+    def handle(self, *args, **options):
+        self.seed(options['weapons'])
+        self.stdout.write(f"{Weapon.objects.count()} weapons in the catalog")
+
+        for label, search in (('index', self.indexed), ('icontains', self.scan)):
+            timings = []
+            for query in QUERIES:
+                search(query)  # warm up
+                for _ in range(options['runs']):
+                    started = time.perf_counter()
+                    search(query)
+                    timings.append(time.perf_counter() - started)
+            timings.sort()
+            self.stdout.write(
+                f"{label:>10}: p50 {timings[len(timings) // 2] * 1000:7.2f} ms | "
+                f"p99 {timings[int(len(timings) * 0.99)] * 1000:7.2f} ms"
+            )
+
+    def indexed(self, query):
+        return search_weapons(query, limit=20)
+
+    def scan(self, query):
+        weapons = Weapon.objects.all()
+        for term in query.split():
+            weapons = weapons.filter(name__icontains=term)
+        return list(weapons.order_by('name')[:20])
+
+    def seed(self, count):
+        missing = count - Weapon.objects.count()
+        if missing <= 0:
+            return
+
+        rng = random.Random(39)
+        types = [code for code, _ in Weapon.WEAPON_TYPES]
+        rarities = [code for code, _ in Weapon.RARITY_CHOICES]
+        # bulk_create skips the signals but not the index triggers
+        Weapon.objects.bulk_create([
+            Weapon(
+                name=f'{rng.choice(MODELS)} {rng.choice(VARIANTS)} bench_search_{i}',
+                weapon_type=rng.choice(types), rarity=rng.choice(rarities),
+                damage=rng.randint(1, 100), range=rng.randint(1, 100), accuracy=rng.randint(1, 100),
+                price=round(rng.uniform(1, 5000), 2),
+            )
+            for i in range(missing)
+        ], batch_size=5000)
+        catalog_changed()
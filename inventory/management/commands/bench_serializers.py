@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from inventory import fast_json
+from inventory.models import Player, Weapon, PlayerWeapon
+from inventory.serializers import WeaponSerializer, PlayerWeaponSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the fast JSON path returns the same bytes as the DRF '
+        'serializers for every hot endpoint, then compare rows per second.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='weapons to serialize per run')
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **options):
+        player = (
+            Player.objects.annotate(owned=Count('weapons')).order_by('-owned').first()
+        )
+        if player is None:
+            raise CommandError('Needs at least one player (and some weapons) in the database')
+
+        self.check_contract(player)
+        self.bench_weapons(options['rows'], options['runs'])
+        self.bench_inventory(player, options['runs'])
+
+    def check_contract(self, player):
+        # a real token rather than force_authenticate, the async views only see headers
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(player)}')
+        paths = ['/api/', '/api/weapons/', '/api/weapons/?page=2', '/api/weapons/?page=last', '/api/profile/', '/api/inventory/']
+
+        for path in paths:
+            with override_settings(FAST_JSON_RESPONSES=False):
+                expected = client.get(path, HTTP_ACCEPT='application/json')
+            actual = client.get(path, HTTP_ACCEPT='application/json')
+            if expected.status_code == 404 and actual.status_code == 404:
+                continue
+            if expected.content != actual.content or expected['Content-Type'] != actual['Content-Type']:
+                raise CommandError(f"{path}: fast path output differs\n{expected.content[:300]}\n{actual.content[:300]}")
+            self.stdout.write(f"contract ok  {path} ({len(actual.content)} bytes)")
+
+    # both sides build a fresh queryset every run, a cached result would leave the sql out of one of them
+
+    def bench_weapons(self, rows, runs):
+        renderer = JSONRenderer()
+
+        def drf():
+            return renderer.render(WeaponSerializer(Weapon.objects.all()[:rows], many=True).data)
+
+        def fast():
+            queryset = Weapon.objects.all()[:rows].values_list(*fast_json.WEAPON_FIELDS)
+            return fast_json.dumps(*fast_json.weapon_dicts(queryset))
+
+        count = Weapon.objects.all()[:rows].count()
+        self.report('weapons', count, runs, drf, fast)
+
+    def bench_inventory(self, player, runs):
+        renderer = JSONRenderer()
+
+        def inventory():
+            return PlayerWeapon.objects.filter(player=player).order_by('id')
+
+        def drf():
+            return renderer.render(PlayerWeaponSerializer(inventory(), many=True).data)
+
+        def fast():
+            rows = list(inventory().values_list(*fast_json.INVENTORY_FIELDS))
+            return fast_json.dumps(*fast_json.inventory_dicts(player, rows))
+
+        self.report('inventory', inventory().count(), runs, drf, fast)
+
+    def report(self, label, count, runs, drf, fast):
+        if not count:
+            self.stdout.write(f"{label}: no rows, skipped")
+            return
+
+        results = {}
+        for name, func in (('drf', drf), ('fast', fast)):
+            func()  # warm up
+            started = time.perf_counter()
+            for _ in range(runs):
+                func()
+            results[name] = count * runs / (time.perf_counter() - started)
+
+        self.stdout.write(
+            f"{label:>10}: drf {results['drf']:10.0f} rows/s | fast {results['fast']:10.0f} rows/s "
+            f"| x{results['fast'] / results['drf']:.1f} (orjson {'on' if fast_json.orjson else 'off'})"
+        )
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+
+from inventory.throttling import SlidingWindowLimiter, DefaultThrottle, StoreError, get_limiter
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the per-request overhead of the sliding window throttle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--keys', type=int, default=1000, help='distinct clients to spread hits over')
+        parser.add_argument('--redis-url', default=settings.THROTTLE_REDIS_URL)
+
+    def handle(self, *args, **options):
+        n, keys = options['requests'], options['keys']
+
+        memory = SlidingWindowLimiter(None)
+        self.report('memory store', self.bench(memory.hit, n, keys), n)
+
+        shared = SlidingWindowLimiter(options['redis_url'])
+        try:
+            shared.redis.client.ping()
+        except (AttributeError, StoreError) as e:
+            self.stdout.write(f"redis store: skipped ({e})")
+        else:
+            self.report('redis store', self.bench(shared.hit, n, keys), n)
+
+        # whole DRF throttle check, whatever store get_limiter() picked
+        throttle = DefaultThrottle()
+        factory = APIRequestFactory()
+        requests = [
+            Request(factory.get('/api/', REMOTE_ADDR=f'10.0.{i // 256 % 256}.{i % 256}'))
+            for i in range(keys)
+        ]
+        get_limiter()
+
+        started = time.perf_counter()
+        for i in range(n):
+            throttle.allow_request(requests[i % keys], None)
+        self.report('DRF throttle', time.perf_counter() - started, n)
+
+    def bench(self, hit, n, keys):
+        started = time.perf_counter()
+        for i in range(n):
+            hit(f'bench:{i % keys}', 10 ** 9, 60)
+        return time.perf_counter() - started
+
+    def report(self, label, elapsed, n):
+        self.stdout.write(
+            f"{label:>14}: {n / elapsed:10.0f} checks/s, {elapsed / n * 1e6:7.1f} us per request"
+        )
@@ -0,0 +1,55 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import snapshot
+from inventory.catalog import get_catalog_version
+from inventory.models import Weapon
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the in-process weapon catalog snapshot and report what it costs '
+        'every worker in memory and build time, and what a lookup costs '
+        'compared to fetching the Weapon row.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        tracemalloc.start()
+        started = time.perf_counter()
+        built = snapshot.CatalogSnapshot.build(get_catalog_version())
+        build_ms = (time.perf_counter() - started) * 1000
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if not len(built):
+            raise CommandError('No weapons in the catalog')
+
+        self.stdout.write(
+            f"snapshot v{built.version}: {len(built)} weapons, built in {build_ms:.0f} ms\n"
+            f"  memory per worker: {traced / 1024 / 1024:.1f} MB allocated, "
+            f"{built.memory_bytes() / 1024 / 1024:.1f} MB deep size "
+            f"({traced / len(built):.0f} B per weapon)"
+        )
+
+        ids = random.choices(list(built.by_id), k=options['lookups'])
+
+        started = time.perf_counter()
+        for weapon_id in ids:
+            built.get(weapon_id)
+        snapshot_us = (time.perf_counter() - started) / len(ids) * 1e6
+
+        started = time.perf_counter()
+        for weapon_id in ids:
+            Weapon.objects.get(id=weapon_id)
+        orm_us = (time.perf_counter() - started) / len(ids) * 1e6
+
+        self.stdout.write(
+            f"  lookup: snapshot {snapshot_us:.2f} us | Weapon.objects.get {orm_us:.0f} us "
+            f"| x{orm_us / snapshot_us:.0f}"
+        )
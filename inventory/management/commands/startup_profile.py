@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# what each process does before it can take work
+ENTRY_POINTS = {
+    'wsgi': 'import cod_inventory.wsgi',
+    'asgi': 'import cod_inventory.asgi',
+    # the URLconf is loaded on the first request, not at boot
+    'web-first-request': 'import cod_inventory.wsgi; from django.urls import get_resolver; get_resolver().url_patterns',
+    'celery': 'from cod_inventory.celery import app; app.loader.import_default_modules()',
+    'bot': 'import telegram_bot.bot as bot; bot.setup_django()',
+}
+
+TIMER = 'import time; _t = time.perf_counter(); {code}; print(time.perf_counter() - _t)'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how long each entry point takes to start in a fresh interpreter '
+        'and which packages it spends that time importing. With --check, fail '
+        'when an entry point goes over its STARTUP_BUDGETS_MS budget.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('entry_points', nargs='*', help=f"any of: {', '.join(ENTRY_POINTS)} (default all)")
+        parser.add_argument('--runs', type=int, default=3, help='timed runs per entry point, best one counts')
+        parser.add_argument('--top', type=int, default=8, help='packages to list per entry point')
+        parser.add_argument('--check', action='store_true', help='exit non-zero when a budget is exceeded')
+
+    def handle(self, *args, **options):
+        budgets = getattr(settings, 'STARTUP_BUDGETS_MS', {})
+        over_budget = []
+
+        unknown = set(options['entry_points']) - set(ENTRY_POINTS)
+        if unknown:
+            raise CommandError(f"Unknown entry points: {', '.join(sorted(unknown))}")
+
+        for name in options['entry_points'] or list(ENTRY_POINTS):
+            code = ENTRY_POINTS[name]
+            best = min(self.time_entry_point(code) for _ in range(options['runs'])) * 1000
+            budget = budgets.get(name)
+
+            line = f"{name:>18}: {best:7.1f} ms"
+            if budget is not None:
+                line += f" (budget {budget} ms)"
+                if best > budget:
+                    over_budget.append(f"{name} {best:.0f} ms > {budget} ms")
+                    line = self.style.ERROR(line + ' OVER BUDGET')
+            self.stdout.write(line)
+
+            for package, micros in self.import_breakdown(code)[:options['top']]:
+                self.stdout.write(f"{'':>20}{package:<32} {micros / 1000:7.1f} ms")
+
+        if options['check'] and over_budget:
+            raise CommandError('Startup budget exceeded: ' + ', '.join(over_budget))
+
+    def run(self, code, *flags):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'cod_inventory.settings'))
+        return subprocess.run(
+            [sys.executable, *flags, '-c', TIMER.format(code=code)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+
+    def time_entry_point(self, code):
+        return float(self.run(code).stdout.strip().splitlines()[-1])
+
+    def import_breakdown(self, code):
+        """
+        Self import time summed per top level package, largest first
+        """
+        totals = defaultdict(int)
+        for line in self.run(code, '-X', 'importtime').stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, _, module = line[len('import time:'):].split('|')
+            totals[module.strip().split('.')[0]] += int(self_us)
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,95 @@
+import random
+import threading
+import time
+
+from django.db import connection, transaction, OperationalError
+from django.db.models import Sum
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import Player, Weapon, PlayerWeapon
+from inventory.trading import TradeError, execute_trade
+
+
+class Command(BaseCommand):
+    help = (
+        'Run random trades between a pool of players from many threads, report '
+        'trades per second and check weapon quantities and cash are conserved.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=20)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=10)
+
+    def handle(self, *args, **options):
+        weapon_ids = list(Weapon.objects.order_by('id').values_list('id', flat=True)[:10])
+        if len(weapon_ids) < 2:
+            raise CommandError('Needs at least two weapons in the database')
+
+        player_ids = self.seed(options['players'], weapon_ids)
+        before = self.totals(player_ids)
+
+        counts = {'completed': 0, 'rejected': 0, 'retried': 0}
+        lock = threading.Lock()
+        stop_at = time.monotonic() + options['seconds']
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                while time.monotonic() < stop_at:
+                    a, b = rng.sample(player_ids, 2)
+                    offered = [{'weapon_id': w, 'quantity': rng.randint(1, 3)} for w in rng.sample(weapon_ids, 2)]
+                    requested = [{'weapon_id': rng.choice(weapon_ids), 'quantity': 1}]
+                    try:
+                        with transaction.atomic():
+                            execute_trade(a, b, offered, requested, rng.randint(0, 5), rng.randint(0, 5))
+                        outcome = 'completed'
+                    except TradeError:
+                        outcome = 'rejected'
+                    except OperationalError:
+                        # sqlite "database is locked", postgres serialization hiccups
+                        outcome = 'retried'
+                    with lock:
+                        counts[outcome] += 1
+            finally:
+                connection.close()
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        after = self.totals(player_ids)
+        self.stdout.write(
+            f"{counts['completed']} trades in {elapsed:.1f}s ({counts['completed'] / elapsed:.1f} trades/s), "
+            f"{counts['rejected']} rejected, {counts['retried']} lock errors"
+        )
+        if before != after:
+            raise CommandError(f"Totals not conserved!\nbefore: {before}\nafter:  {after}")
+        self.stdout.write(self.style.SUCCESS('Weapon quantities and cash conserved'))
+
+    def seed(self, count, weapon_ids):
+        players = []
+        for i in range(count):
+            player, _ = Player.objects.get_or_create(username=f'stress_trader_{i}')
+            players.append(player.id)
+
+        PlayerWeapon.objects.filter(player_id__in=players).delete()
+        PlayerWeapon.objects.bulk_create([
+            PlayerWeapon(player_id=player_id, weapon_id=weapon_id, quantity=20)
+            for player_id in players for weapon_id in weapon_ids
+        ])
+        Player.objects.filter(id__in=players).update(cash=1000)
+        return players
+
+    def totals(self, player_ids):
+        quantities = dict(
+            PlayerWeapon.objects.filter(player_id__in=player_ids)
+            .values('weapon_id').annotate(total=Sum('quantity'))
+            .values_list('weapon_id', 'total')
+        )
+        cash = Player.objects.filter(id__in=player_ids).aggregate(total=Sum('cash'))['total']
+        return {'weapons': quantities, 'cash': round(cash, 6)}
@@ -64,3 +64,106 @@ class PlayerWeapon(models.Model):
     
     
 
+class CatalogVersion(models.Model):
+    # one row, bumped after every catalog change so each process knows when to
+    # rebuild its weapon snapshot (see inventory/catalog.py), kept in the database
+    # so that works with any cache
+    version = models.BigIntegerField(default=1)
+
+
+
+# materialized analytics, refreshed by inventory.tasks.refresh_catalog_analytics
+# never write these from request code, see inventory/analytics.py
+
+class AnalyticsChange(models.Model):
+    # change log filled by signals, drained by every analytics refresh
+    player_id = models.BigIntegerField(null=True, blank=True)
+    weapon_id = models.BigIntegerField(null=True, blank=True)
+
+
+class WeaponPopularity(models.Model):
+    weapon = models.OneToOneField(Weapon, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    owners = models.IntegerField(default=0)
+    total_quantity = models.IntegerField(default=0)
+    
+    class Meta:
+        indexes = [models.Index(fields=['-owners'])]
+        
+        
+class OwnershipStat(models.Model):
+    rarity = models.CharField(max_length=57, choices=Weapon.RARITY_CHOICES)
+    weapon_type = models.CharField(max_length=54, choices=Weapon.WEAPON_TYPES)
+    owners = models.IntegerField(default=0)
+    total_quantity = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('rarity', 'weapon_type')
+        
+        
+class PlayerArsenalValue(models.Model):
+    # plain id, not a FK, so the row outlives a deleted player until the next refresh
+    player_id = models.BigIntegerField(primary_key=True)
+    level = models.IntegerField()
+    value = models.FloatField(default=0)
+    
+    class Meta:
+        indexes = [models.Index(fields=['level'])]
+        
+        
+class LevelArsenalStat(models.Model):
+    level = models.IntegerField(primary_key=True)
+    players = models.IntegerField(default=0)
+    total_value = models.FloatField(default=0)
+    
+    @property
+    def average_value(self):
+        return self.total_value / self.players if self.players else 0.0
+
+
+class ArsenalValuation(models.Model):
+    # a player's arsenal value over time, filled by inventory.tasks.snapshot_arsenal_values.
+    # daily rows get rolled into weekly, then monthly ones, so periods never overlap
+    # and a player's whole series is one range scan of the (player, day) index
+    RESOLUTION_CHOICES = [
+        ('d', 'Daily'),
+        ('w', 'Weekly'),
+        ('m', 'Monthly'),
+    ]
+    
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='valuations', db_index=False)
+    # first day of the period
+    day = models.DateField()
+    resolution = models.CharField(max_length=1, choices=RESOLUTION_CHOICES, default='d')
+    value = models.FloatField()
+    weapon_count = models.IntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'day'], name='arsenal_valuation_player_day'),
+        ]
+
+
+class Trade(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    proposer = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='trades_proposed')
+    recipient = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='trades_received')
+    # [{"weapon_id": 1, "quantity": 2}, ...]
+    offered = models.JSONField(default=list, blank=True)
+    requested = models.JSONField(default=list, blank=True)
+    offered_cash = models.FloatField(default=0)
+    requested_cash = models.FloatField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Trade #{self.pk} {self.proposer_id} -> {self.recipient_id} ({self.status})"
+    
+    @property
+    def is_gift(self):
+        return not self.requested and not self.requested_cash
@@ -0,0 +1,129 @@
+import logging
+import re
+
+from django.db import connections
+
+from .models import Weapon
+from .catalog import WEAPON_FIELDS
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'inventory_weapon_fts'
+PG_INDEX = 'inventory_weapon_name_fts'
+
+# words of a query, every one has to prefix-match a word of the name
+MAX_TERMS = 8
+
+# external content FTS5 table over inventory_weapon.name, the triggers keep it
+# in sync with every write, including bulk_create() and queryset.update()
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, content='inventory_weapon', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON inventory_weapon BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON inventory_weapon BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name ON inventory_weapon BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+# postgres keeps an expression index in sync by itself
+POSTGRES_SCHEMA = [
+    f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON inventory_weapon USING GIN (to_tsvector('simple', name))",
+]
+
+
+def query_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def install(using='default', rebuild=False):
+    """
+    Create the search index if it is missing, and fill it from the existing
+    weapons when it is new or `rebuild` is set
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            existed = FTS_TABLE in connection.introspection.table_names(cursor)
+            for statement in SQLITE_SCHEMA:
+                cursor.execute(statement)
+            if rebuild or not existed:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            for statement in POSTGRES_SCHEMA:
+                cursor.execute(statement)
+            if rebuild:
+                cursor.execute(f"REINDEX INDEX {PG_INDEX}")
+        else:
+            logger.warning(f"No weapon search index for {connection.vendor}, searches will scan the table")
+
+
+def install_after_migrate(sender, using='default', **kwargs):
+    # post_migrate receiver, the index isn't a model so makemigrations doesn't know about it
+    if 'inventory_weapon' in connections[using].introspection.table_names():
+        install(using)
+
+
+def _ranked_ids(cursor, vendor, terms, rarity, weapon_type, limit, offset):
+    filters, params = [], []
+    if rarity:
+        filters.append('w.rarity = %s')
+        params.append(rarity)
+    if weapon_type:
+        filters.append('w.weapon_type = %s')
+        params.append(weapon_type)
+    extra = ''.join(f' AND {condition}' for condition in filters)
+
+    if vendor == 'sqlite':
+        # "ak"* "74"* - quoted so the words can't be read as FTS operators
+        match = ' '.join(f'"{term}"*' for term in terms)
+        cursor.execute(
+            f"SELECT w.id FROM {FTS_TABLE} f JOIN inventory_weapon w ON w.id = f.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{extra} "
+            f"ORDER BY bm25({FTS_TABLE}), w.name, w.id LIMIT %s OFFSET %s",
+            [match, *params, limit, offset],
+        )
+    else:
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        cursor.execute(
+            "SELECT w.id FROM inventory_weapon w "
+            "WHERE to_tsvector('simple', w.name) @@ to_tsquery('simple', %s)" + extra + " "
+            "ORDER BY ts_rank(to_tsvector('simple', w.name), to_tsquery('simple', %s)) DESC, w.name, w.id "
+            "LIMIT %s OFFSET %s",
+            [tsquery, *params, tsquery, limit, offset],
+        )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def search_weapons(query, rarity=None, weapon_type=None, limit=20, offset=0, using='default'):
+    """
+    Weapons whose name has a word starting with every word of `query`, best
+    match first, as WEAPON_FIELDS tuples
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    connection = connections[using]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        weapons = Weapon.objects.using(using)
+        for term in terms:
+            weapons = weapons.filter(name__icontains=term)
+        if rarity:
+            weapons = weapons.filter(rarity=rarity)
+        if weapon_type:
+            weapons = weapons.filter(weapon_type=weapon_type)
+        return list(weapons.order_by('name', 'id').values_list(*WEAPON_FIELDS)[offset:offset + limit])
+
+    with connection.cursor() as cursor:
+        ids = _ranked_ids(cursor, connection.vendor, terms, rarity, weapon_type, limit, offset)
+
+    rows = {row[0]: row for row in Weapon.objects.using(using).filter(id__in=ids).values_list(*WEAPON_FIELDS)}
+    return [rows[weapon_id] for weapon_id in ids if weapon_id in rows]
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from .models import Player, Weapon, PlayerWeapon
+from .models import Player, Weapon, PlayerWeapon, WeaponPopularity, OwnershipStat, LevelArsenalStat, Trade
+from .snapshot import get_snapshot
 
 
 class WeaponSerializer(serializers.ModelSerializer):
@@ -21,11 +22,16 @@ class PlayerSerializer(serializers.ModelSerializer):
     
 class PlayerWeaponSerializer(serializers.ModelSerializer):
     player = PlayerSerializer(read_only=True)
-    Weapon_name = serializers.CharField(source='weapon.name', read_only=True)
+    Weapon_name = serializers.SerializerMethodField()
     
     class Meta:
         model = PlayerWeapon
         fields = ['id', 'player', 'weapon', 'Weapon_name', 'quantity', 'acquired_at']
+    
+    def get_Weapon_name(self, obj):
+        # from the catalog snapshot instead of one weapon query per row
+        weapon = get_snapshot().get(obj.weapon_id)
+        return weapon.name if weapon else obj.weapon.name
         
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -57,3 +63,94 @@ class TelegramLinkSerializer(serializers.Serializer):
     telegram_username = serializers.CharField(required=True)
     telegram_chat_id = serializers.IntegerField(required=True)
 
+
+
+class LoadoutOptimizeSerializer(serializers.Serializer):
+    budget = serializers.FloatField(required=False, min_value=0)
+    weights = serializers.DictField(child=serializers.FloatField(min_value=0), required=False)
+    slots = serializers.DictField(child=serializers.IntegerField(min_value=0, max_value=10), required=False)
+
+    def validate_weights(self, value):
+        unknown = set(value) - {'damage', 'range', 'accuracy'}
+        if unknown:
+            raise serializers.ValidationError(f"Unknown stats: {', '.join(sorted(unknown))}")
+        return value
+
+    def validate_slots(self, value):
+        weapon_types = {code for code, _ in Weapon.WEAPON_TYPES}
+        unknown = set(value) - weapon_types
+        if unknown:
+            raise serializers.ValidationError(f"Unknown weapon types: {', '.join(sorted(unknown))}")
+        return value
+
+
+class TopWeaponsSerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class WeaponSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100)
+    rarity = serializers.ChoiceField(choices=Weapon.RARITY_CHOICES, required=False)
+    weapon_type = serializers.ChoiceField(choices=Weapon.WEAPON_TYPES, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+    offset = serializers.IntegerField(min_value=0, default=0)
+
+
+class ValuationRangeSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['start'] > data['end']:
+            raise serializers.ValidationError('start must be before end')
+        return data
+
+
+class OwnershipStatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OwnershipStat
+        fields = ['rarity', 'weapon_type', 'owners', 'total_quantity']
+
+
+class WeaponPopularitySerializer(serializers.ModelSerializer):
+    weapon_name = serializers.CharField(source='weapon.name', read_only=True)
+
+    class Meta:
+        model = WeaponPopularity
+        fields = ['weapon', 'weapon_name', 'owners', 'total_quantity']
+
+
+class LevelArsenalStatSerializer(serializers.ModelSerializer):
+    average_value = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = LevelArsenalStat
+        fields = ['level', 'players', 'total_value', 'average_value']
+
+
+class TradeItemSerializer(serializers.Serializer):
+    weapon_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class TradeCreateSerializer(serializers.Serializer):
+    recipient = serializers.SlugRelatedField(slug_field='username', queryset=Player.objects.all())
+    offered = TradeItemSerializer(many=True, required=False, default=list)
+    requested = TradeItemSerializer(many=True, required=False, default=list)
+    offered_cash = serializers.FloatField(min_value=0, default=0)
+    requested_cash = serializers.FloatField(min_value=0, default=0)
+
+    def validate(self, attrs):
+        if not (attrs['offered'] or attrs['requested'] or attrs['offered_cash'] or attrs['requested_cash']):
+            raise serializers.ValidationError("A trade needs at least one weapon or some cash")
+        return attrs
+
+
+class TradeSerializer(serializers.ModelSerializer):
+    proposer = serializers.CharField(source='proposer.username', read_only=True)
+    recipient = serializers.CharField(source='recipient.username', read_only=True)
+
+    class Meta:
+        model = Trade
+        fields = ['id', 'proposer', 'recipient', 'offered', 'requested', 'offered_cash',
+                  'requested_cash', 'status', 'created_at', 'completed_at']
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Player, Weapon, PlayerWeapon
+from .catalog import bump_inventory_version
+from .analytics import record_change
+
+
+# NOTE: queryset.update() / bulk_create() skip these, call snapshot.catalog_changed(),
+# bump_inventory_version() and record_change() yourself
+
+@receiver(post_save, sender=Weapon)
+@receiver(post_delete, sender=Weapon)
+def weapon_catalog_changed(sender, instance, **kwargs):
+    # imported here, the snapshot isn't needed by every process that loads the signals
+    from .snapshot import catalog_changed
+
+    # after commit, so no worker rebuilds its snapshot from the old rows
+    transaction.on_commit(catalog_changed)
+    record_change(weapon_id=instance.pk)
+
+
+@receiver(post_save, sender=PlayerWeapon)
+@receiver(post_delete, sender=PlayerWeapon)
+def player_weapon_changed(sender, instance, **kwargs):
+    # after commit, the cache must never hold up or roll back a purchase
+    player_id = instance.player_id
+    transaction.on_commit(lambda: bump_inventory_version(player_id))
+    record_change(player_id=instance.player_id, weapon_id=instance.weapon_id)
+
+
+@receiver(post_save, sender=Player)
+def player_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    # logins save last_login only, those don't move any analytics
+    if not created and update_fields is not None and 'level' not in update_fields:
+        return
+    record_change(player_id=instance.pk)
+
+
+@receiver(post_delete, sender=Player)
+def player_deleted(sender, instance, **kwargs):
+    record_change(player_id=instance.pk)
@@ -0,0 +1,217 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Weapon
+from .catalog import WEAPON_FIELDS, bump_catalog_version, get_catalog_version
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'inventory:catalog'
+
+# how stale a snapshot may get before the catalog version is checked again,
+# with pub/sub only as a safety net for lost messages
+RECHECK_SECONDS = 60
+POLL_SECONDS = 2
+RECONNECT_SECONDS = 5
+
+# one Weapon row, a plain tuple in WEAPON_FIELDS order so fast_json.weapon_dicts takes it as is
+WeaponRecord = namedtuple('WeaponRecord', WEAPON_FIELDS)
+
+
+class CatalogSnapshot:
+    """
+    Read only copy of the whole weapon catalog for this process, swapped as a
+    whole when the catalog version changes and never modified in place
+    """
+
+    def __init__(self, version, records):
+        self.version = version
+        # catalog order, same as Weapon.Meta.ordering
+        self.records = records
+        self.by_id = {record.id: record for record in records}
+        self.position = {record.id: i for i, record in enumerate(records)}
+        self.checked_at = time.monotonic()
+
+    @classmethod
+    def build(cls, version):
+        intern = sys.intern
+        rows = Weapon.objects.order_by('rarity', 'name', 'id').values_list(*WEAPON_FIELDS)
+        records = tuple(
+            # types and rarities repeat on every row, keep one copy of each
+            WeaponRecord(pk, name, intern(weapon_type), damage, weapon_range, accuracy, intern(rarity), price, created_at)
+            for pk, name, weapon_type, damage, weapon_range, accuracy, rarity, price, created_at in rows
+        )
+        return cls(version, records)
+
+    def get(self, weapon_id):
+        try:
+            return self.by_id.get(int(weapon_id))
+        except (TypeError, ValueError):
+            return None
+
+    def __contains__(self, weapon_id):
+        return weapon_id in self.by_id
+
+    def __len__(self):
+        return len(self.records)
+
+    def memory_bytes(self):
+        """
+        Rough deep size: the containers plus every distinct object they hold
+        """
+        seen = set()
+        total = sys.getsizeof(self.records) + sys.getsizeof(self.by_id) + sys.getsizeof(self.position)
+        for record in self.records:
+            total += sys.getsizeof(record)
+            for value in record:
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    total += sys.getsizeof(value)
+        for value in self.position.values():
+            if id(value) not in seen:
+                seen.add(id(value))
+                total += sys.getsizeof(value)
+        return total
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+_listening = False
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def get_snapshot():
+    """
+    Return this process's catalog snapshot, no queries unless it has to be rebuilt
+    """
+    _ensure_listener()
+    snapshot = _snapshot
+    interval = RECHECK_SECONDS if _listening else POLL_SECONDS
+    if snapshot is None or time.monotonic() - snapshot.checked_at > interval:
+        snapshot = refresh()
+    return snapshot
+
+
+def refresh():
+    """
+    Compare with the shared catalog version and rebuild if it moved
+    """
+    global _snapshot
+    version = get_catalog_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        snapshot.checked_at = time.monotonic()
+        return snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            started = time.perf_counter()
+            new = CatalogSnapshot.build(version)
+            # readers holding the old one keep using it, nothing is mutated
+            _snapshot = new
+            logger.info(
+                f"Catalog snapshot v{version}: {len(new)} weapons, "
+                f"{new.memory_bytes() / 1024 / 1024:.1f} MB, built in {(time.perf_counter() - started) * 1000:.0f} ms "
+                f"(pid {os.getpid()})"
+            )
+        return _snapshot
+
+
+def catalog_changed():
+    """
+    Bump the catalog version and tell every process to rebuild. Run it after
+    the change is committed, or other workers may rebuild from the old rows.
+    """
+    version = bump_catalog_version()
+    if _snapshot is not None:
+        _snapshot.checked_at = float('-inf')
+
+    client = _publisher()
+    if client is not None:
+        try:
+            client.publish(CHANNEL, version)
+        except _redis().RedisError as e:
+            logger.warning(f"Couldn't announce catalog v{version}, workers will notice by polling: {str(e)}")
+
+
+def start():
+    """
+    Build the snapshot in the background at startup so the first request doesn't wait for it
+    """
+    def warm_up():
+        try:
+            get_snapshot()
+        except Exception as e:
+            # no database yet (migrate, collectstatic), the first lookup builds it
+            logger.warning(f"Catalog snapshot not built at startup: {str(e)}")
+        finally:
+            connection.close()
+
+    threading.Thread(target=warm_up, name='catalog-snapshot-warmup', daemon=True).start()
+
+
+_publisher_client = None
+
+
+def _redis():
+    # imported on first use, not when the signals load this module at boot
+    try:
+        import redis
+    except ImportError:  # without redis every process polls the catalog version instead
+        return None
+    return redis
+
+
+def _pubsub_url():
+    return getattr(settings, 'CATALOG_PUBSUB_URL', '') if _redis() is not None else ''
+
+
+def _publisher():
+    global _publisher_client
+    if _publisher_client is None and _pubsub_url():
+        _publisher_client = _redis().Redis.from_url(_pubsub_url(), socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _publisher_client
+
+
+def _ensure_listener():
+    global _listener_pid
+    # threads don't survive a fork, gunicorn --preload workers start their own
+    if _listener_pid == os.getpid() or not _pubsub_url():
+        return
+    with _listener_lock:
+        if _listener_pid != os.getpid():
+            _listener_pid = os.getpid()
+            threading.Thread(target=_listen, name='catalog-snapshot-listener', daemon=True).start()
+
+
+def _listen():
+    global _listening
+    redis = _redis()
+    client = redis.Redis.from_url(_pubsub_url(), socket_connect_timeout=1, health_check_interval=30)
+    while True:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(CHANNEL)
+            _listening = True
+            # changes made while we weren't subscribed
+            refresh()
+            for _ in pubsub.listen():
+                refresh()
+        except redis.RedisError as e:
+            logger.warning(f"Catalog pub/sub unreachable, polling every {POLL_SECONDS}s: {str(e)}")
+        except Exception:
+            logger.exception('Catalog snapshot rebuild failed')
+        finally:
+            _listening = False
+            pubsub.close()
+            connection.close()
+        time.sleep(RECONNECT_SECONDS)
@@ -1,12 +1,29 @@
 from celery import shared_task
 from django.core.mail import send_mail
 from django.conf import settings
+from smtplib import SMTPConnectError, SMTPServerDisconnected
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-@shared_task
-def send_welcome_email(player_email, player_name):
+# connection level failures, the mail was not handed over so sending again is safe
+RETRYABLE_EMAIL_ERRORS = (SMTPConnectError, SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+# queues are set in CELERY_TASK_ROUTES, nobody reads these results so they are not stored
+EMAIL_TASK_OPTIONS = {
+    'bind': True,
+    'ignore_result': True,
+    'rate_limit': '30/m',
+    'max_retries': 3,
+    'default_retry_delay': 30,
+}
+
+# recompute_player_levels slice, 10 chunks of levels.CHUNK_SIZE players
+LEVEL_CHUNKS_PER_TASK = 10
+
+@shared_task(**EMAIL_TASK_OPTIONS)
+def send_welcome_email(self, player_email, player_name):
     """
     Send welcome email to new player
     """
@@ -56,12 +73,16 @@ COD Inventory Team
         logger.info(f"Welcome email sent successfully to {player_email}")
         return f"Welcome email sent to {player_email}"
         
+    except RETRYABLE_EMAIL_ERRORS as e:
+        logger.warning(f"Welcome email to {player_email} failed, retrying: {str(e)}")
+        raise self.retry(exc=e, countdown=self.default_retry_delay * 2 ** self.request.retries)
+        
     except Exception as e:
         logger.error(f"Failed to send welcome email to {player_email}: {str(e)}")
         return f"Failed to send email: {str(e)}"
 
-@shared_task
-def send_weapon_purchase_confirmation(player_email, player_name, weapon_name, quantity, total_cost):
+@shared_task(**EMAIL_TASK_OPTIONS)
+def send_weapon_purchase_confirmation(self, player_email, player_name, weapon_name, quantity, total_cost):
     """
     Send confirmation email when player purchases weapons
     """
@@ -96,11 +117,16 @@ COD Inventory Team
         logger.info(f"Purchase confirmation sent to {player_email} for {weapon_name}")
         return f"Purchase confirmation sent to {player_email}"
         
+    except RETRYABLE_EMAIL_ERRORS as e:
+        logger.warning(f"Purchase confirmation to {player_email} failed, retrying: {str(e)}")
+        raise self.retry(exc=e, countdown=self.default_retry_delay * 2 ** self.request.retries)
+        
     except Exception as e:
         logger.error(f"Failed to send purchase confirmation to {player_email}: {str(e)}")
         return f"Failed to send confirmation: {str(e)}"
 
-@shared_task
+# deleting expired sessions twice is harmless, so ack only after it ran
+@shared_task(ignore_result=True, acks_late=True, rate_limit='1/m')
 def cleanup_old_sessions():
     """
     Cleanup task to remove old/expired sessions
@@ -120,7 +146,7 @@ def cleanup_old_sessions():
         logger.error(f"Failed to cleanup sessions: {str(e)}")
         return f"Failed to cleanup: {str(e)}"
 
-@shared_task
+@shared_task(ignore_result=True, acks_late=True, rate_limit='1/m')
 def generate_daily_stats():
     """
     Generate daily statistics for the system
@@ -154,4 +180,61 @@ def generate_daily_stats():
         
     except Exception as e:
         logger.error(f"Failed to generate daily stats: {str(e)}")
-        return f"Failed to generate stats: {str(e)}"
\ No newline at end of file
+        return f"Failed to generate stats: {str(e)}"
+
+@shared_task(ignore_result=True, acks_late=True, rate_limit='6/m')
+def refresh_catalog_analytics(full=False):
+    """
+    Refresh the materialized ownership / popularity / level tables
+    """
+    try:
+        from .analytics import refresh_analytics
+        
+        result = refresh_analytics(full=full)
+        
+        logger.info(f"Catalog analytics refreshed: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Failed to refresh catalog analytics: {str(e)}")
+        return f"Failed to refresh analytics: {str(e)}"
+
+@shared_task(bind=True, ignore_result=True, acks_late=True)
+def recompute_player_levels(self, after_id=0, scanned=0, changed=0, started_at=None):
+    """
+    Full level pass over every player, a slice of chunks per task run. Each
+    run queues the next one from where it stopped, so no task runs long and a
+    lost worker only repeats one slice.
+    """
+    from .levels import recompute_levels
+    
+    started_at = started_at or time.time()
+    last_id, slice_scanned, slice_changed = recompute_levels(after_id, max_chunks=LEVEL_CHUNKS_PER_TASK)
+    scanned += slice_scanned
+    changed += slice_changed
+    
+    if last_id is not None:
+        self.apply_async(kwargs={
+            'after_id': last_id, 'scanned': scanned, 'changed': changed, 'started_at': started_at,
+        })
+        return
+    
+    logger.info(f"Player levels recomputed: {scanned} players, {changed} levelled up in {time.time() - started_at:.0f}s")
+
+@shared_task(ignore_result=True, acks_late=True, rate_limit='1/m')
+def snapshot_arsenal_values():
+    """
+    Daily arsenal value point for every player, then roll old points into weeks / months
+    """
+    try:
+        from .valuation import snapshot_values, downsample
+        
+        stored = snapshot_values()
+        rolled = downsample()
+        
+        logger.info(f"Arsenal values snapshotted for {stored} players, rolled up {rolled}")
+        return {'stored': stored, 'rolled': rolled}
+        
+    except Exception as e:
+        logger.error(f"Failed to snapshot arsenal values: {str(e)}")
+        return f"Failed to snapshot arsenal values: {str(e)}"
@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from . import loadout, snapshot
+
+
+# tests run in one process, nothing has to be shared between workers
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def reset_catalog():
+    # the snapshot and the matrix live for the whole process, start every test from the database
+    snapshot._snapshot = None
+    loadout._matrix = None
+
+
+class CleanState:
+
+    def setUp(self):
+        super().setUp()
+        reset_catalog()
+        # ids are reused between tests, versions and stored responses must not be
+        cache.clear()
+
+
+@override_settings(CACHES=LOCAL_CACHE, CATALOG_PUBSUB_URL='')
+class InventoryTestCase(CleanState, TestCase):
+    """
+    Base for the app's tests: per process cache instead of the shared redis
+    the settings default to, and a clean catalog snapshot and cache per test
+    """
+
+
+@override_settings(CACHES=LOCAL_CACHE, CATALOG_PUBSUB_URL='')
+class InventoryTransactionTestCase(CleanState, TransactionTestCase):
+    """
+    Same, with the data really committed, for code that reaches the database
+    from other threads (the async ORM under asyncio.run)
+    """
@@ -1,3 +1,380 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import SimpleTestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .catalog import bump_catalog_version
+from .models import Player, Weapon, PlayerWeapon, ArsenalValuation, Trade
+from .levels import level_for, recompute_levels
+from .search import search_weapons
+from .valuation import DAILY_RETENTION_DAYS, downsample, snapshot_values
+from .trading import execute_trade
+from .testing import LOCAL_CACHE, InventoryTestCase, reset_catalog
+from . import async_views, loadout, snapshot
+
+
+class LoadoutTests(InventoryTestCase):
+
+    def weapon(self, name, weapon_type, price, damage, weapon_range, accuracy):
+        return Weapon.objects.create(
+            name=name, weapon_type=weapon_type, rarity='common', price=price,
+            damage=damage, range=weapon_range, accuracy=accuracy,
+        )
+
+    def test_spends_the_whole_budget(self):
+        self.weapon('AK-47', 'assault_rifle', 30, 90, 10, 50)
+        self.weapon('AWP', 'sniper_rifle', 30, 10, 90, 50)
+        self.weapon('MP5', 'submachine_gun', 30, 50, 50, 90)
+
+        weapon_ids, total_price, _ = loadout.optimize_loadout(90)
+
+        self.assertEqual(len(weapon_ids), 3)
+        self.assertEqual(total_price, 90)
+
+    def test_weakest_weapon_is_picked_when_it_is_all_there_is(self):
+        only = self.weapon('AK-47', 'assault_rifle', 30, 50, 50, 50)
+
+        weapon_ids, total_price, score = loadout.optimize_loadout(100)
+
+        self.assertEqual(weapon_ids, [only.id])
+        self.assertEqual(total_price, 30)
+        self.assertGreater(score, 0)
+
+        reset_catalog()
+        self.weapon('M4A1', 'assault_rifle', 30, 50, 50, 50)
+        weapon_ids, _, _ = loadout.optimize_loadout(100, slots={'assault_rifle': 2})
+        self.assertEqual(len(weapon_ids), 2)
+
+    def test_zero_weights_pick_nothing(self):
+        self.weapon('AK-47', 'assault_rifle', 30, 50, 50, 50)
+
+        weapon_ids, _, _ = loadout.optimize_loadout(100, weights={'damage': 0, 'range': 0, 'accuracy': 0})
+
+        self.assertEqual(weapon_ids, [])
+
+    def test_never_goes_over_budget(self):
+        best = self.weapon('AK-47', 'assault_rifle', 30.01, 90, 90, 90)
+        self.weapon('M4A1', 'assault_rifle', 29.99, 80, 80, 80)
+        cheap = self.weapon('AK-74', 'assault_rifle', 10, 10, 10, 10)
+
+        weapon_ids, total_price, _ = loadout.optimize_loadout(59.99, slots={'assault_rifle': 2})
+
+        # the two best together cost 60.00
+        self.assertLessEqual(total_price, 59.99)
+        self.assertEqual(sorted(weapon_ids), [best.id, cheap.id])
+
+
+class AnalyticsTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(Player.objects.create_user('analyst', password='secret-pass'))
+
+    def test_top_weapons_limit_is_validated(self):
+        url = reverse('top_weapons_analytics')
+        for limit in ('-1', '0', '101', 'ten'):
+            response = self.client.get(url, {'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+        self.assertEqual(self.client.get(url, {'limit': '5'}).status_code, 200)
+
+
+class FastJsonContractTests(InventoryTestCase):
+    """
+    The fast json path has to return the same bytes as the DRF serializers
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        prices = [0.1, 86.35, 99.99, 1234.5, 5.0, 1e-05, 12345678.9]
+        weapons = Weapon.objects.bulk_create([
+            Weapon(
+                name=f'Weapon "{i}" é', weapon_type='pistol', rarity='rare', price=prices[i % len(prices)],
+                damage=i, range=100 - i, accuracy=50,
+            )
+            for i in range(25)
+        ])
+        cls.player = Player.objects.create_user('contract', password='secret-pass', cash=1000.25)
+        PlayerWeapon.objects.bulk_create([
+            PlayerWeapon(player=cls.player, weapon=weapon, quantity=i + 1) for i, weapon in enumerate(weapons[:5])
+        ])
+
+    def test_same_bytes_as_the_serializers(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.player)}')
+        paths = ['/api/', '/api/weapons/', '/api/weapons/?page=2', '/api/weapons/?page=last', '/api/profile/', '/api/inventory/']
+
+        for path in paths:
+            with self.subTest(path=path):
+                with override_settings(FAST_JSON_RESPONSES=False):
+                    expected = client.get(path, HTTP_ACCEPT='application/json')
+                actual = client.get(path, HTTP_ACCEPT='application/json')
+                self.assertEqual(expected.status_code, 200)
+                self.assertEqual(actual.status_code, 200)
+                self.assertEqual(actual['Content-Type'], expected['Content-Type'])
+                self.assertEqual(actual.content, expected.content)
+
+
+class IdempotencyTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.player = Player.objects.create_user('buyer', password='secret-pass', cash=100)
+        self.weapon = Weapon.objects.create(
+            name='AK-47', weapon_type='assault_rifle', rarity='common', price=30, damage=50, range=50, accuracy=50,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.player)
+
+    def test_retried_purchase_is_charged_once(self):
+        url = reverse('add_weapon')
+        first = self.client.post(url, {'weapon_id': self.weapon.pk}, format='json', HTTP_IDEMPOTENCY_KEY='buy-1')
+        retry = self.client.post(url, {'weapon_id': self.weapon.pk}, format='json', HTTP_IDEMPOTENCY_KEY='buy-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.player.refresh_from_db()
+        self.assertEqual(self.player.cash, 70)
+
+    def test_reads_are_never_replayed(self):
+        url = reverse('trades')
+        before = self.client.get(url, HTTP_IDEMPOTENCY_KEY='list-1')
+        Trade.objects.create(proposer=self.player, recipient=Player.objects.create_user('friend'), offered_cash=1)
+        after = self.client.get(url, HTTP_IDEMPOTENCY_KEY='list-1')
+
+        self.assertNotIn('Idempotent-Replayed', after)
+        self.assertEqual((len(before.data['trades']), len(after.data['trades'])), (0, 1))
+
+    def test_key_reused_for_another_request(self):
+        url = reverse('add_weapon')
+        self.client.post(url, {'weapon_id': self.weapon.pk}, format='json', HTTP_IDEMPOTENCY_KEY='buy-1')
+        response = self.client.post(url, {'weapon_id': self.weapon.pk, 'quantity': 2}, format='json', HTTP_IDEMPOTENCY_KEY='buy-1')
+
+        self.assertEqual(response.status_code, 422)
+
+
+class TradeTests(InventoryTestCase):
+
+    def test_round_trip_leaves_no_empty_rows(self):
+        proposer = Player.objects.create_user('proposer', password='secret-pass')
+        recipient = Player.objects.create_user('recipient', password='secret-pass')
+        weapon = Weapon.objects.create(
+            name='AK-47', weapon_type='assault_rifle', rarity='common', price=30, damage=50, range=50, accuracy=50,
+        )
+        PlayerWeapon.objects.create(player=proposer, weapon=weapon, quantity=2)
+
+        with transaction.atomic():
+            execute_trade(
+                proposer.pk, recipient.pk,
+                offered=[{'weapon_id': weapon.pk, 'quantity': 2}],
+                requested=[{'weapon_id': weapon.pk, 'quantity': 2}],
+            )
+
+        self.assertFalse(PlayerWeapon.objects.filter(player=recipient).exists())
+        self.assertEqual(PlayerWeapon.objects.get(player=proposer, weapon=weapon).quantity, 2)
+
+
+class LevelTests(InventoryTestCase):
+
+    def test_negative_points_are_level_one(self):
+        self.assertEqual(level_for(-50, -1000), 1)
+        self.assertEqual(level_for(None, None), 1)
+        self.assertEqual(level_for(40, 0), 3)
+
+    def test_negative_quantity_does_not_stop_the_recompute(self):
+        weapon = Weapon.objects.create(
+            name='AK-47', weapon_type='assault_rifle', rarity='legendary', price=100, damage=50, range=50, accuracy=50,
+        )
+        broken = Player.objects.create_user('broken', password='secret-pass')
+        collector = Player.objects.create_user('collector', password='secret-pass')
+        PlayerWeapon.objects.bulk_create([
+            PlayerWeapon(player=broken, weapon=weapon, quantity=-5),
+            PlayerWeapon(player=collector, weapon=weapon, quantity=5),
+        ])
+
+        last_id, scanned, changed = recompute_levels()
+
+        self.assertEqual((last_id, scanned, changed), (None, 2, 1))
+        broken.refresh_from_db()
+        collector.refresh_from_db()
+        self.assertEqual(broken.level, 1)
+        self.assertGreater(collector.level, 1)
+
+
+class StartupBudgetTests(SimpleTestCase):
+
+    def test_entry_points_start_within_budget(self):
+        # every entry point in a fresh interpreter, budgets are STARTUP_BUDGETS_MS
+        try:
+            call_command('startup_profile', '--check', '--runs', '1', '--top', '0', stdout=StringIO())
+        except CommandError as e:
+            self.fail(str(e))
+
+
+class AsyncUrls:
+    # the api the way asgi.py serves it, with the async read views
+    urlpatterns = [
+        path('api/weapons/', async_views.weapon_list, name='weapon_list'),
+        path('api/', include('inventory.urls')),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncUrls)
+class AsyncViewTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.player = Player.objects.create_user('async_player', password='secret-pass')
+        # csrf checked like a real server would, the test client skips it by default
+        self.client = APIClient(enforce_csrf_checks=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.player)}')
+
+    def test_token_writes_reach_the_drf_view(self):
+        response = self.client.post('/api/weapons/', {
+            'name': 'AK-47', 'weapon_type': 'assault_rifle', 'rarity': 'common',
+            'damage': 50, 'range': 50, 'accuracy': 50, 'price': 30,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+
+    def test_bad_pages_are_only_throttled_by_the_drf_view(self):
+        with mock.patch.object(async_views, 'check_throttle') as check_throttle:
+            response = self.client.get('/api/weapons/', {'page': 999}, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, 404)
+        check_throttle.assert_not_called()
+
+
+class CatalogSnapshotTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.player = Player.objects.create_user('snapshot_buyer', password='secret-pass', cash=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.player)
+
+    def create_elsewhere(self, **fields):
+        # like another worker would, nothing in this process hears about it
+        Weapon.objects.bulk_create([Weapon(
+            name='AK-47', weapon_type='assault_rifle', rarity='common', damage=50, range=50, accuracy=50, **fields
+        )])
+        return Weapon.objects.get(name='AK-47')
+
+    def test_purchases_read_the_table_not_the_snapshot(self):
+        snapshot.get_snapshot()
+        weapon = self.create_elsewhere(price=30)
+
+        response = self.client.post(reverse('add_weapon'), {'weapon_id': weapon.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        Weapon.objects.filter(pk=weapon.pk).update(price=50)
+        response = self.client.post(reverse('add_weapon'), {'weapon_id': weapon.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['remaining_coins'], 20)
+
+    def test_version_is_seen_without_a_shared_cache(self):
+        before = snapshot.get_snapshot()
+        weapon = self.create_elsewhere(price=30)
+        # the other worker's per process cache
+        with override_settings(CACHES={'default': dict(LOCAL_CACHE['default'], LOCATION='other-worker')}):
+            bump_catalog_version()
+
+        # one poll interval later
+        before.checked_at = float('-inf')
+        self.assertIn(weapon.pk, snapshot.get_snapshot())
+
+
+class SearchTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ak = self.weapon('AK-47', 'assault_rifle', 'common')
+        self.akm = self.weapon('AKM Gold', 'assault_rifle', 'legendary')
+        self.barrett = self.weapon('Barrett .50 Cal', 'sniper_rifle', 'epic')
+        self.weapon('MP5', 'submachine_gun', 'rare')
+
+    def weapon(self, name, weapon_type, rarity):
+        return Weapon.objects.create(
+            name=name, weapon_type=weapon_type, rarity=rarity, price=10, damage=50, range=50, accuracy=50,
+        )
+
+    def names(self, query, **filters):
+        return {row[1] for row in search_weapons(query, **filters)}
+
+    def test_prefix_matches(self):
+        self.assertEqual(self.names('ak'), {'AK-47', 'AKM Gold'})
+        self.assertEqual(self.names('barr'), {'Barrett .50 Cal'})
+        self.assertEqual(self.names('ak 47'), {'AK-47'})
+        self.assertEqual(self.names('zz'), set())
+
+    def test_update_rename_stays_in_sync(self):
+        # queryset.update() skips the signals, the index has to follow anyway
+        Weapon.objects.filter(pk=self.barrett.pk).update(name='Intervention')
+
+        self.assertEqual(self.names('barr'), set())
+        self.assertEqual(self.names('inter'), {'Intervention'})
+
+    def test_deleted_weapons_drop_out(self):
+        self.ak.delete()
+
+        self.assertEqual(self.names('ak'), {'AKM Gold'})
+
+    def test_rarity_and_type_filters(self):
+        self.assertEqual(self.names('ak', rarity='legendary'), {'AKM Gold'})
+        self.assertEqual(self.names('ak', weapon_type='sniper_rifle'), set())
+        self.assertEqual(self.names('barr', rarity='epic', weapon_type='sniper_rifle'), {'Barrett .50 Cal'})
+
+
+class ValuationTests(InventoryTestCase):
+
+    def test_rolled_up_points_are_never_overwritten(self):
+        player = Player.objects.create_user('collector', password='secret-pass')
+        weapon = Weapon.objects.create(
+            name='AK-47', weapon_type='assault_rifle', rarity='common', price=30, damage=50, range=50, accuracy=50,
+        )
+        PlayerWeapon.objects.create(player=player, weapon=weapon, quantity=1)
+
+        today = timezone.localdate()
+        old_week = today - timedelta(days=DAILY_RETENTION_DAYS + 14)
+        old_week -= timedelta(days=old_week.weekday())
+        # a whole week of daily points, old enough to be rolled up
+        ArsenalValuation.objects.bulk_create([
+            ArsenalValuation(player=player, day=old_week + timedelta(days=offset), value=10, weapon_count=1)
+            for offset in range(7)
+        ])
+        downsample(today)
+        weekly = ArsenalValuation.objects.get(player=player, day=old_week)
+        self.assertEqual(weekly.resolution, 'w')
+
+        with self.assertRaises(ValueError):
+            snapshot_values(day=old_week)
+        self.assertEqual(ArsenalValuation.objects.get(player=player, day=old_week).resolution, 'w')
+
+        self.assertEqual(snapshot_values(day=today), 1)
+
+    def test_emptied_inventory_overwrites_the_day_with_zero(self):
+        player = Player.objects.create_user('seller', password='secret-pass')
+        weapon = Weapon.objects.create(
+            name='AK-47', weapon_type='assault_rifle', rarity='common', price=30, damage=50, range=50, accuracy=50,
+        )
+        owned = PlayerWeapon.objects.create(player=player, weapon=weapon, quantity=2)
+        today = timezone.localdate()
+
+        snapshot_values(day=today)
+        point = ArsenalValuation.objects.get(player=player, day=today)
+        self.assertEqual((point.value, point.weapon_count), (60, 1))
+
+        owned.delete()
+        snapshot_values(day=today)
+        point.refresh_from_db()
+        self.assertEqual((point.value, point.weapon_count), (0, 0))
@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+try:
+    import redis
+except ImportError:  # redis is optional, limits are then per process
+    redis = None
+
+StoreError = redis.RedisError if redis is not None else ()
+
+logger = logging.getLogger(__name__)
+
+# how long to stay on the in-memory store after redis failed
+REDIS_RETRY_AFTER = 30
+
+# sliding window counter: counts for the current and previous fixed window,
+# read, checked and incremented in one round trip
+SLIDING_WINDOW_SCRIPT = """
+local counts = redis.call('MGET', KEYS[1], KEYS[2])
+local current = tonumber(counts[1]) or 0
+local previous = tonumber(counts[2]) or 0
+local estimate = previous * tonumber(ARGV[2]) + current
+if estimate >= tonumber(ARGV[1]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return {1, current, previous}
+"""
+
+
+def parse_rate(rate):
+    """
+    '30/min' -> (30, 60)
+    """
+    num, period = rate.split('/')
+    return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+def retry_after(limit, window, current, previous, elapsed):
+    """
+    Seconds until the sliding estimate drops below `limit` again
+    """
+    if current >= limit or not previous:
+        return window - elapsed
+    # previous * (1 - e / window) + current < limit
+    clears_at = window * (1 - (limit - current) / previous)
+    return max(clears_at - elapsed, 0.0)
+
+
+class MemoryStore:
+    """
+    Per-process fallback with the same sliding window maths as the redis script
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.last_sweep = 0.0
+
+    def hit(self, key, window_index, weight, limit, window):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_sweep > 60:
+                self.sweep()
+                self.last_sweep = now
+
+            current = self.counts.get((key, window, window_index), 0)
+            previous = self.counts.get((key, window, window_index - 1), 0)
+            if previous * weight + current >= limit:
+                return False, current, previous
+            self.counts[(key, window, window_index)] = current + 1
+            return True, current + 1, previous
+
+    def sweep(self):
+        # drop windows older than the previous one, they no longer count
+        now = time.time()
+        self.counts = {
+            (key, window, index): count
+            for (key, window, index), count in self.counts.items()
+            if index >= now // window - 1
+        }
+
+
+class RedisStore:
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.script = self.client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def hit(self, key, window_index, weight, limit, window):
+        allowed, current, previous = self.script(
+            keys=[f'{key}:{window_index}', f'{key}:{window_index - 1}'],
+            args=[limit, weight, window * 2],
+        )
+        return bool(allowed), int(current), int(previous)
+
+
+class SlidingWindowLimiter:
+    """
+    Shared rate limiter, redis when THROTTLE_REDIS_URL is reachable and an
+    in-memory store otherwise
+    """
+
+    def __init__(self, url=None):
+        self.memory = MemoryStore()
+        self.redis = RedisStore(url) if redis is not None and url else None
+        self.redis_down_until = 0.0
+
+    def store(self):
+        if self.redis is not None and time.monotonic() >= self.redis_down_until:
+            return self.redis
+        return self.memory
+
+    def hit(self, key, limit, window):
+        """
+        Count one request for `key`, returns (allowed, retry_after_seconds)
+        """
+        now = time.time()
+        window_index, elapsed = divmod(now, window)
+        window_index = int(window_index)
+        weight = 1 - elapsed / window
+
+        store = self.store()
+        try:
+            allowed, current, previous = store.hit(key, window_index, weight, limit, window)
+        except StoreError as e:
+            logger.warning(f"Throttle store unreachable, using in-memory limits: {str(e)}")
+            self.redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+            allowed, current, previous = self.memory.hit(key, window_index, weight, limit, window)
+
+        if allowed:
+            return True, None
+        return False, retry_after(limit, window, current, previous, elapsed)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = SlidingWindowLimiter(getattr(settings, 'THROTTLE_REDIS_URL', None))
+    return _limiter
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    DRF throttle keyed by scope plus user id, or client IP for anonymous
+    requests. Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+    """
+    scope = 'user'
+    key_by_ip = False
+
+    def get_cache_key(self, request):
+        scope = self.get_scope(request)
+        if request.user and request.user.is_authenticated and not self.key_by_ip:
+            return f'throttle:{scope}:user:{request.user.pk}'
+        return f'throttle:{scope}:ip:{self.get_ident(request)}'
+
+    def get_scope(self, request):
+        return self.scope
+
+    def allow_request(self, request, view):
+        rates = settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {})
+        rate = rates.get(self.get_scope(request))
+        if rate is None:
+            return True
+
+        limit, window = parse_rate(rate)
+        allowed, self.wait_seconds = get_limiter().hit(self.get_cache_key(request), limit, window)
+        return allowed
+
+    def wait(self):
+        return getattr(self, 'wait_seconds', None)
+
+
+class DefaultThrottle(SlidingWindowThrottle):
+    # 'user' for logged in players, 'anon' for everyone else
+    def get_scope(self, request):
+        if request.user and request.user.is_authenticated:
+            return 'user'
+        return 'anon'
+
+
+class AuthThrottle(SlidingWindowThrottle):
+    # login / register hash passwords, limit them per IP whoever claims to log in
+    scope = 'auth'
+    key_by_ip = True
+
+
+class InventoryWriteThrottle(SlidingWindowThrottle):
+    scope = 'inventory_write'
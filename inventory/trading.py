@@ -0,0 +1,130 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Player, PlayerWeapon, Trade
+from .catalog import bump_inventory_version
+from .analytics import record_change
+
+
+class TradeError(Exception):
+    pass
+
+
+def _merge(items):
+    merged = defaultdict(int)
+    for item in items:
+        merged[int(item['weapon_id'])] += int(item['quantity'])
+    return merged
+
+
+def execute_trade(proposer_id, recipient_id, offered=(), requested=(), offered_cash=0, requested_cash=0):
+    """
+    Move `offered` weapons and cash from proposer to recipient and `requested`
+    ones back, all or nothing.
+
+    Rows are always locked in the same global order - players by id, then
+    their PlayerWeapon rows by (player_id, weapon_id) - so two trades touching
+    the same players queue up instead of deadlocking. Must run inside
+    transaction.atomic().
+    """
+    if proposer_id == recipient_id:
+        raise TradeError("Can't trade with yourself")
+
+    # (from, to, {weapon_id: quantity})
+    moves = [
+        (proposer_id, recipient_id, _merge(offered)),
+        (recipient_id, proposer_id, _merge(requested)),
+    ]
+    weapon_ids = sorted({weapon_id for _, _, items in moves for weapon_id in items})
+
+    players = {
+        player.id: player
+        for player in Player.objects.select_for_update().filter(id__in=[proposer_id, recipient_id]).order_by('id')
+    }
+    if len(players) != 2:
+        raise TradeError('Player not found')
+
+    rows = {
+        (row.player_id, row.weapon_id): row
+        for row in PlayerWeapon.objects.select_for_update()
+        .filter(player_id__in=[proposer_id, recipient_id], weapon_id__in=weapon_ids)
+        .order_by('player_id', 'weapon_id')
+    }
+    quantities = {key: row.quantity for key, row in rows.items()}
+
+    for giver, taker, items in moves:
+        for weapon_id, quantity in items.items():
+            have = quantities.get((giver, weapon_id), 0)
+            if quantity <= 0 or have < quantity:
+                raise TradeError(
+                    f"{players[giver].username} doesn't have {quantity} of weapon {weapon_id}"
+                )
+            quantities[(giver, weapon_id)] = have - quantity
+            quantities[(taker, weapon_id)] = quantities.get((taker, weapon_id), 0) + quantity
+
+    proposer, recipient = players[proposer_id], players[recipient_id]
+    if proposer.cash < offered_cash:
+        raise TradeError(f"{proposer.username} doesn't have {offered_cash} cash")
+    if recipient.cash < requested_cash:
+        raise TradeError(f"{recipient.username} doesn't have {requested_cash} cash")
+
+    # one statement each for updates, deletes and inserts
+    to_update, to_delete, to_create = [], [], []
+    for (player_id, weapon_id), quantity in quantities.items():
+        row = rows.get((player_id, weapon_id))
+        if row is None:
+            # got some and handed them all back in the same trade
+            if quantity:
+                to_create.append(PlayerWeapon(player_id=player_id, weapon_id=weapon_id, quantity=quantity))
+        elif quantity == 0:
+            to_delete.append(row.id)
+        elif quantity != row.quantity:
+            row.quantity = quantity
+            to_update.append(row)
+
+    if to_delete:
+        PlayerWeapon.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        PlayerWeapon.objects.bulk_update(to_update, ['quantity'])
+    if to_create:
+        PlayerWeapon.objects.bulk_create(to_create)
+
+    if offered_cash or requested_cash:
+        proposer.cash += requested_cash - offered_cash
+        recipient.cash += offered_cash - requested_cash
+        Player.objects.bulk_update([proposer, recipient], ['cash'])
+
+    # bulk writes skip the signals, do their work once the trade is committed
+    def after_commit():
+        for player_id in (proposer_id, recipient_id):
+            bump_inventory_version(player_id)
+        for weapon_id in weapon_ids:
+            record_change(player_id=proposer_id, weapon_id=weapon_id)
+            record_change(player_id=recipient_id, weapon_id=weapon_id)
+
+    transaction.on_commit(after_commit)
+
+
+def accept_trade(trade_id, player_id):
+    """
+    Run a pending trade on behalf of its recipient
+    """
+    with transaction.atomic():
+        try:
+            trade = Trade.objects.select_for_update().get(id=trade_id, recipient_id=player_id)
+        except Trade.DoesNotExist:
+            raise TradeError('Trade not found')
+        if trade.status != 'pending':
+            raise TradeError(f'Trade is already {trade.status}')
+
+        execute_trade(
+            trade.proposer_id, trade.recipient_id,
+            trade.offered, trade.requested,
+            trade.offered_cash, trade.requested_cash,
+        )
+        trade.status = 'completed'
+        trade.completed_at = timezone.now()
+        trade.save(update_fields=['status', 'completed_at'])
+    return trade
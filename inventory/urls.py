@@ -1,16 +1,33 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# async versions of the hot reads under ASGI, see async_views.py
+if settings.ASYNC_API_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = None
+
 urlpatterns = [
     # not protected by authentication, public apis
-    path('', views.health_check, name='health_check'),
-    path('weapons/', views.WeaponListView.as_view(), name='weapon_list'),
+    path('', read_views.health_check if read_views else views.health_check, name='health_check'),
+    path('weapons/', read_views.weapon_list if read_views else views.WeaponListView.as_view(), name='weapon_list'),
+    path('weapons/search/', views.search_weapons_view, name='weapon_search'),
     path('register/', views.register_player, name='register'),
     path('login/', views.login_player, name='login'),
     
     # those apis who are protected by authentication
-    path('profile/', views.player_profile, name='player_profile'),
-    path('inventory/', views.player_inventory, name='player_inventory'),
+    path('profile/', read_views.player_profile if read_views else views.player_profile, name='player_profile'),
+    path('inventory/', read_views.player_inventory if read_views else views.player_inventory, name='player_inventory'),
     path('inventory/add/', views.add_weapon_to_inventory, name='add_weapon'),
     path('inventory/remove/<int:weapon_id>/', views.remove_weapon_from_inventory, name='remove_weapon'),
+    path('loadout/optimize/', views.optimize_loadout_view, name='optimize_loadout'),
+    path('trades/', views.trades, name='trades'),
+    path('trades/<int:trade_id>/accept/', views.accept_trade_view, name='accept_trade'),
+    path('trades/<int:trade_id>/cancel/', views.cancel_trade, name='cancel_trade'),
+    path('analytics/ownership/', views.ownership_analytics, name='ownership_analytics'),
+    path('analytics/top-weapons/', views.top_weapons_analytics, name='top_weapons_analytics'),
+    path('analytics/levels/', views.level_analytics, name='level_analytics'),
+    path('analytics/levels/<int:level>/', views.level_analytics, name='level_analytics_detail'),
+    path('valuation/', views.valuation_history, name='valuation_history'),
 ]
\ No newline at end of file
@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Player, ArsenalValuation
+
+
+BATCH_SIZE = 2000
+
+# daily points are kept this long, then averaged into weeks
+DAILY_RETENTION_DAYS = 35
+# weekly points are kept this long, then averaged into months
+WEEKLY_RETENTION_DAYS = 365
+
+
+def snapshot_values(day=None):
+    """
+    Store today's arsenal value and weapon count for every player, from one
+    grouped query. Players who own nothing get a 0 point, so an emptied
+    inventory doesn't keep its last value. Running it again the same day
+    overwrites that day's points. Days past the daily retention window are
+    refused, they may already be part of a weekly or monthly point.
+    """
+    today = timezone.localdate()
+    day = day or today
+    if day < today - timedelta(days=DAILY_RETENTION_DAYS):
+        raise ValueError(f"Can't snapshot {day}, daily points are only kept for {DAILY_RETENTION_DAYS} days")
+    # from Player, the left join keeps the players without any weapons
+    totals = (
+        Player.objects.order_by()
+        .annotate(
+            value=Coalesce(
+                Sum(F('weapons__quantity') * F('weapons__weapon__price')), Value(0.0), output_field=FloatField(),
+            ),
+            weapon_count=Count('weapons'),
+        )
+        .values_list('id', 'value', 'weapon_count')
+    )
+
+    stored = 0
+    batch = []
+    for player_id, value, weapon_count in totals.iterator(chunk_size=BATCH_SIZE):
+        batch.append(ArsenalValuation(
+            player_id=player_id, day=day, resolution='d', value=value, weapon_count=weapon_count,
+        ))
+        if len(batch) == BATCH_SIZE:
+            stored += _save(batch)
+            batch = []
+    if batch:
+        stored += _save(batch)
+    return stored
+
+
+def _save(rows):
+    ArsenalValuation.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['player', 'day'],
+        update_fields=['resolution', 'value', 'weapon_count'],
+    )
+    return len(rows)
+
+
+def _roll_up(source, target, trunc, before):
+    """
+    Average `source` rows dated before `before` into one `target` row per
+    player and period, a chunk of players at a time
+    """
+    rolled = 0
+    after_id = 0
+    while True:
+        player_ids = list(
+            Player.objects.filter(id__gt=after_id).order_by('id').values_list('id', flat=True)[:BATCH_SIZE]
+        )
+        if not player_ids:
+            return rolled
+        after_id = player_ids[-1]
+
+        old = ArsenalValuation.objects.filter(
+            player_id__gte=player_ids[0], player_id__lte=after_id, resolution=source, day__lt=before,
+        )
+        with transaction.atomic():
+            periods = [
+                ArsenalValuation(
+                    player_id=row['player_id'], day=row['period'], resolution=target,
+                    value=row['value'], weapon_count=round(row['weapon_count']),
+                )
+                for row in old.order_by()
+                .annotate(period=trunc('day'))
+                .values('player_id', 'period')
+                .annotate(value=Avg('value'), weapon_count=Avg('weapon_count'))
+            ]
+            if periods:
+                # the old rows go first, a period can start on the same day as one of them
+                old.delete()
+                _save(periods)
+                rolled += len(periods)
+
+
+def downsample(today=None):
+    """
+    Roll daily points past the retention window into weeks and weekly ones
+    into months. Only whole periods are rolled, so none is ever averaged twice.
+    """
+    today = today or timezone.localdate()
+
+    daily_cutoff = today - timedelta(days=DAILY_RETENTION_DAYS)
+    week_start = daily_cutoff - timedelta(days=daily_cutoff.weekday())
+
+    weekly_cutoff = today - timedelta(days=WEEKLY_RETENTION_DAYS)
+    month_start = weekly_cutoff.replace(day=1)
+
+    return {
+        'weekly': _roll_up('d', 'w', TruncWeek, week_start),
+        'monthly': _roll_up('w', 'm', TruncMonth, month_start),
+    }
+
+
+def series(player_id, start=None, end=None):
+    """
+    A player's points oldest first, (day, resolution, value, weapon_count)
+    """
+    points = ArsenalValuation.objects.filter(player_id=player_id)
+    if start:
+        points = points.filter(day__gte=start)
+    if end:
+        points = points.filter(day__lte=end)
+    return list(points.order_by('day').values_list('day', 'resolution', 'value', 'weapon_count'))
@@ -1,17 +1,30 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 
 
-from .models import Player, Weapon, PlayerWeapon
+from .models import Player, Weapon, PlayerWeapon, WeaponPopularity, OwnershipStat, LevelArsenalStat, Trade
 from .serializers import (
     PlayerSerializer, WeaponSerializer, PlayerWeaponSerializer,
-    UserRegistrationSerializer, LoginSerializer
+    UserRegistrationSerializer, LoginSerializer, LoadoutOptimizeSerializer,
+    OwnershipStatSerializer, WeaponPopularitySerializer, LevelArsenalStatSerializer, WeaponSearchSerializer,
+    TopWeaponsSerializer, ValuationRangeSerializer,
+    TradeCreateSerializer, TradeSerializer
 )
+from .throttling import AuthThrottle, InventoryWriteThrottle
+from . import fast_json
+from .idempotency import idempotent
+from .trading import TradeError, accept_trade
+from .snapshot import get_snapshot
+from .levels import update_player_level
+from .search import search_weapons
+from .valuation import series as valuation_series
 
 from .tasks import send_welcome_email
 
@@ -22,9 +35,51 @@ class WeaponListView(generics.ListCreateAPIView):
     queryset = Weapon.objects.all()
     serializer_class = WeaponSerializer
     permission_classes = [IsAuthenticated]
+    
+    def list(self, request, *args, **kwargs):
+        # plain json clients skip the serializer, same bytes (see fast_json.py)
+        if not fast_json.enabled(request):
+            return super().list(request, *args, **kwargs)
+        
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*fast_json.WEAPON_FIELDS)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            data, floats = fast_json.weapon_dicts(queryset)
+            return fast_json.json_response(data, floats)
+        
+        data, floats = fast_json.weapon_dicts(page)
+        return fast_json.json_response({
+            'count': self.paginator.page.paginator.count,
+            'next': self.paginator.get_next_link(),
+            'previous': self.paginator.get_previous_link(),
+            'results': data,
+        }, floats)
+
+# weapon name search, ranked, optionally narrowed by rarity / type (see search.py)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_weapons_view(request):
+    
+    serializer = WeaponSearchSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    params = serializer.validated_data
+    rows = search_weapons(
+        params['q'],
+        rarity=params.get('rarity'),
+        weapon_type=params.get('weapon_type'),
+        limit=params['limit'],
+        offset=params['offset'],
+    )
+    results, _ = fast_json.weapon_dicts(rows)
+    return Response({'query': params['q'], 'results': results})
+
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([AuthThrottle])
 def register_player(request):
     
     serializer = UserRegisterSerializer(data=request.data)
@@ -32,7 +87,7 @@ def register_player(request):
         Player = serializer.save()
         
         if Player.email:
-            send_welcome_email(Player.email, Player.username)
+            send_welcome_email.delay(Player.email, Player.username)
             
         
         refresh = RefreshToken.for_user(Player)
@@ -54,6 +109,7 @@ def register_player(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([AuthThrottle])
 def login_player(request):
     
     serializer = LoginSerializer(data=request.data)
@@ -87,6 +143,10 @@ def login_player(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def player_profile(request):
+    if fast_json.enabled(request):
+        data = fast_json.player_dict(request.user, request.user.weapons.count())
+        return fast_json.json_response(data, [data['cash']])
+    
     serializer = PlayerSerializer(request.user)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -97,7 +157,16 @@ def player_profile(request):
 @permission_classes([IsAuthenticated])
 def player_inventory(request):
     
-    inventory = PlayerWeapon.objects.filter(player=request.user)
+    inventory = PlayerWeapon.objects.filter(player=request.user).order_by('id')
+    if fast_json.enabled(request):
+        rows = list(inventory.values_list(*fast_json.INVENTORY_FIELDS))
+        data, floats = fast_json.inventory_dicts(request.user, rows)
+        return fast_json.json_response({
+            'player': request.user.username,
+            'total_weapons': len(rows),
+            'inventory': data
+        }, floats)
+    
     serializer = PlayerWeaponSerializer(inventory, many=True)
     return Response({
         'player': request.user.username,
@@ -110,6 +179,8 @@ def player_inventory(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([InventoryWriteThrottle])
+@idempotent
 def add_weapon_to_inventory(request):
   
     weapon_id = request.data.get('weapon_id')
@@ -122,41 +193,65 @@ def add_weapon_to_inventory(request):
         )
     
     try:
-        weapon = Weapon.objects.get(id=weapon_id)
-    except Weapon.DoesNotExist:
+        weapon_id = int(weapon_id)
+    except (TypeError, ValueError):
         return Response(
             {'error': 'Weapon not found'}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
-    #  do the player have enough coins?
-    total_cost = weapon.price * quantity
-    if request.user.coins < total_cost:
+    # lock the player row first, same order trades use, so cash can't be spent twice
+    try:
+        with transaction.atomic():
+            player = Player.objects.select_for_update().get(pk=request.user.pk)
+            
+            # price straight from the table, a worker's catalog snapshot may be behind
+            weapon = Weapon.objects.filter(pk=weapon_id).values_list(*fast_json.WEAPON_FIELDS, named=True).first()
+            if weapon is None:
+                return Response(
+                    {'error': 'Weapon not found'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            
+            #  do the player have enough coins?
+            total_cost = weapon.price * quantity
+            if player.cash < total_cost:
+                return Response(
+                    {'error': f'Insufficient coins. Need {total_cost}, have {player.cash}'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # wanna add a weapon to inventory or update quantity>??
+            player_weapon, created = PlayerWeapon.objects.get_or_create(
+                player=player,
+                weapon_id=weapon.id,
+                defaults={'quantity': quantity}
+            )
+            
+            if not created:
+                player_weapon.quantity += quantity
+                player_weapon.save()
+            
+            # coins lost
+            player.cash -= total_cost
+            player.save(update_fields=['cash'])
+            
+            # new weapons may be worth a level
+            update_player_level(player)
+    except IntegrityError:
+        # deleted while we were buying it
         return Response(
-            {'error': f'Insufficient coins. Need {total_cost}, have {request.user.coins}'}, 
-            status=status.HTTP_400_BAD_REQUEST
+            {'error': 'Weapon not found'}, 
+            status=status.HTTP_404_NOT_FOUND
         )
     
-    # wanna add a weapon to inventory or update quantity>??
-    player_weapon, created = PlayerWeapon.objects.get_or_create(
-        player=request.user,
-        weapon=weapon,
-        defaults={'quantity': quantity}
-    )
-    
-    if not created:
-        player_weapon.quantity += quantity
-        player_weapon.save()
-    
-    # coins lost
-    request.user.coins -= total_cost
-    request.user.save()
-    
+    weapon_data, _ = fast_json.weapon_dicts([weapon])
     return Response({
         'message': f'Added {quantity} {weapon.name}(s) to inventory',
-        'weapon': WeaponSerializer(weapon).data,
+        'weapon': weapon_data[0],
         'quantity': player_weapon.quantity,
-        'remaining_coins': request.user.coins
+        'remaining_coins': player.cash,
+        'level': player.level
     }, status=status.HTTP_201_CREATED)
 
 
@@ -165,6 +260,8 @@ def add_weapon_to_inventory(request):
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([InventoryWriteThrottle])
+@idempotent
 def remove_weapon_from_inventory(request, weapon_id):
    
     try:
@@ -173,7 +270,8 @@ def remove_weapon_from_inventory(request, weapon_id):
             weapon_id=weapon_id
         )
         
-        weapon_name = player_weapon.weapon.name
+        weapon = get_snapshot().get(player_weapon.weapon_id)
+        weapon_name = weapon.name if weapon else player_weapon.weapon.name
         player_weapon.delete()
         
         return Response({
@@ -188,6 +286,173 @@ def remove_weapon_from_inventory(request, weapon_id):
         
         
         
+# best weapon set for a budget, scored on the numeric weapon stats
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def optimize_loadout_view(request):
+    
+    serializer = LoadoutOptimizeSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    # numpy is only loaded by the processes that actually optimize loadouts
+    from .loadout import optimize_loadout
+    
+    budget = serializer.validated_data.get('budget', request.user.cash)
+    weapon_ids, total_price, score = optimize_loadout(
+        budget,
+        weights=serializer.validated_data.get('weights'),
+        slots=serializer.validated_data.get('slots'),
+    )
+    
+    snapshot = get_snapshot()
+    weapons, _ = fast_json.weapon_dicts(snapshot.by_id[i] for i in weapon_ids if i in snapshot)
+    return Response({
+        'budget': budget,
+        'total_price': total_price,
+        'score': score,
+        'weapons': weapons
+    })
+        
+        
+        
+# player to player trades, gifts go through at once, swaps wait for the recipient
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([InventoryWriteThrottle])
+@idempotent
+def trades(request):
+    
+    if request.method == 'GET':
+        mine = (
+            Trade.objects.filter(Q(proposer=request.user) | Q(recipient=request.user))
+            .select_related('proposer', 'recipient')
+            .order_by('-created_at')[:50]
+        )
+        return Response({'trades': TradeSerializer(mine, many=True).data})
+    
+    serializer = TradeCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    if data['recipient'].pk == request.user.pk:
+        return Response({'error': "Can't trade with yourself"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    trade = Trade.objects.create(
+        proposer=request.user,
+        recipient=data['recipient'],
+        offered=data['offered'],
+        requested=data['requested'],
+        offered_cash=data['offered_cash'],
+        requested_cash=data['requested_cash'],
+    )
+    
+    if trade.is_gift:
+        try:
+            trade = accept_trade(trade.pk, trade.recipient_id)
+        except TradeError as e:
+            trade.status = 'cancelled'
+            trade.save(update_fields=['status'])
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(TradeSerializer(trade).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([InventoryWriteThrottle])
+@idempotent
+def accept_trade_view(request, trade_id):
+    
+    try:
+        trade = accept_trade(trade_id, request.user.pk)
+    except TradeError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(TradeSerializer(trade).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([InventoryWriteThrottle])
+def cancel_trade(request, trade_id):
+    
+    # either side can back out while it is pending
+    cancelled = (
+        Trade.objects.filter(id=trade_id, status='pending')
+        .filter(Q(proposer=request.user) | Q(recipient=request.user))
+        .update(status='cancelled')
+    )
+    if not cancelled:
+        return Response({'error': 'No pending trade found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({'message': 'Trade cancelled'})
+        
+        
+        
+# dashboard analytics, read straight from the tables refresh_catalog_analytics keeps up to date
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ownership_analytics(request):
+    
+    stats = OwnershipStat.objects.order_by('rarity', 'weapon_type')
+    return Response({'ownership': OwnershipStatSerializer(stats, many=True).data})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def top_weapons_analytics(request):
+    
+    serializer = TopWeaponsSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    top = WeaponPopularity.objects.select_related('weapon').order_by('-owners')[:serializer.validated_data['limit']]
+    return Response({'top_weapons': WeaponPopularitySerializer(top, many=True).data})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def level_analytics(request, level=None):
+    
+    if level is not None:
+        stat = get_object_or_404(LevelArsenalStat, pk=level)
+        return Response(LevelArsenalStatSerializer(stat).data)
+    
+    stats = LevelArsenalStat.objects.order_by('level')
+    return Response({'levels': LevelArsenalStatSerializer(stats, many=True).data})
+        
+        
+        
+# a player's arsenal value over time, daily points first rolled into weekly then monthly ones
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def valuation_history(request):
+    
+    serializer = ValuationRangeSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    points = valuation_series(
+        request.user.pk,
+        start=serializer.validated_data.get('start'),
+        end=serializer.validated_data.get('end'),
+    )
+    return Response({
+        'player': request.user.username,
+        'series': [
+            {'day': day.isoformat(), 'resolution': resolution, 'value': value, 'weapon_count': weapon_count}
+            for day, resolution, value, weapon_count in points
+        ]
+    })
+        
+        
+        
 # simple api health check, used in my previous projects
 
 @api_view(['GET'])
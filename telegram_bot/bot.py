@@ -1,16 +1,12 @@
 # telegram_bot/bot.py
 import os
-import django
 import logging
-from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes
+from asgiref.sync import sync_to_async
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 from django.conf import settings
-
-# Setup Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cod_inventory.settings')
-django.setup()
-
-from inventory.models import Player, PlayerWeapon
+from django.core.cache import cache
 
 # Enable logging
 logging.basicConfig(
@@ -19,10 +15,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# weapons per /inventory page, keeps every page far below telegram's 4096 char limit
+INVENTORY_PAGE_SIZE = 10
+INVENTORY_PAGE_TTL = 60 * 60
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle /start command - Register user and link Telegram account
     """
+    from inventory.models import Player
+    
     user = update.effective_user
     chat_id = update.effective_chat.id
     
@@ -78,46 +80,132 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"Use /inventory to see your current weapons."
         )
 
+def render_inventory_page(player_id, page):
+    """
+    Render one page of a player's weapons, returns (text, page, total_pages).
+
+    Only the page's rows are loaded, joined with their weapon in one query.
+    Rendered pages are cached per inventory and catalog version so any
+    purchase, removal or weapon edit makes them stale. Only with a shared
+    cache though, purchases made through the api never bump a per process one.
+    """
+    from inventory.catalog import cache_is_shared, get_catalog_version, get_inventory_version
+    from inventory.models import PlayerWeapon
+    
+    cached = cache_is_shared()
+    prefix = f"bot:inventory:{player_id}:{get_inventory_version(player_id)}"
+    total = cache.get(f"{prefix}:count") if cached else None
+    if total is None:
+        total = PlayerWeapon.objects.filter(player_id=player_id).count()
+        if cached:
+            cache.set(f"{prefix}:count", total, INVENTORY_PAGE_TTL)
+    total_pages = max(1, -(-total // INVENTORY_PAGE_SIZE))
+    page = min(max(page, 1), total_pages)
+
+    key = f"{prefix}:{get_catalog_version()}:{page}" if cached else None
+    text = cache.get(key) if cached else None
+    if text is None:
+        start = (page - 1) * INVENTORY_PAGE_SIZE
+        rows = (
+            PlayerWeapon.objects.filter(player_id=player_id)
+            .order_by('weapon__rarity', 'weapon__name', 'id')
+            .values_list(
+                'quantity', 'weapon__name', 'weapon__weapon_type',
+                'weapon__damage', 'weapon__range', 'weapon__rarity',
+            )[start:start + INVENTORY_PAGE_SIZE]
+        )
+        text = ""
+        for quantity, name, weapon_type, damage, weapon_range, rarity in rows:
+            text += f"• {name} ({weapon_type})\n"
+            text += f"  Damage: {damage} | Range: {weapon_range}\n"
+            text += f"  Rarity: {rarity.title()} | Qty: {quantity}\n\n"
+        if cached:
+            cache.set(key, text, INVENTORY_PAGE_TTL)
+
+    return text, page, total_pages
+
+
+def inventory_keyboard(page, total_pages):
+    if total_pages <= 1:
+        return None
+
+    buttons = []
+    if page > 1:
+        buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f"inv:{page - 1}"))
+    buttons.append(InlineKeyboardButton(f"{page}/{total_pages}", callback_data=f"inv:{page}"))
+    if page < total_pages:
+        buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"inv:{page + 1}"))
+    return InlineKeyboardMarkup([buttons])
+
+
+async def build_inventory_message(player, page):
+    body, page, total_pages = await sync_to_async(render_inventory_page)(player.id, page)
+
+    inventory_text = f"🎯 {player.username}'s Inventory\n"
+    inventory_text += f"💰 Coins: {player.cash}\n"
+    inventory_text += f"📊 Level: {player.level}\n\n"
+    inventory_text += f"🔫 Weapons (page {page}/{total_pages}):\n"
+    inventory_text += body
+    return inventory_text, inventory_keyboard(page, total_pages)
+
+
 async def inventory_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Handle /inventory command - Show user's weapon inventory
+    Handle /inventory command - Show the first page of user's weapon inventory
     """
+    from inventory.models import Player, PlayerWeapon
+    
     chat_id = update.effective_chat.id
     
     try:
-        player = Player.objects.get(telegram_chat_id=str(chat_id))
-        weapons = PlayerWeapon.objects.filter(player=player)
-        
-        if not weapons.exists():
-            await update.message.reply_text(
-                f"Your inventory is empty! 😔\n\n"
-                f"You have {player.coins} coins to buy weapons!\n"
-                f"Visit our website to purchase weapons."
-            )
-            return
-        
-        inventory_text = f"🎯 {player.username}'s Inventory\n"
-        inventory_text += f"💰 Coins: {player.coins}\n"
-        inventory_text += f"📊 Level: {player.level}\n\n"
-        inventory_text += "🔫 Weapons:\n"
-        
-        for pw in weapons:
-            weapon = pw.weapon
-            inventory_text += f"• {weapon.name} ({weapon.weapon_type})\n"
-            inventory_text += f"  Damage: {weapon.damage} | Range: {weapon.range}\n"
-            inventory_text += f"  Rarity: {weapon.rarity.title()} | Qty: {pw.quantity}\n\n"
-        
-        await update.message.reply_text(inventory_text)
-        
+        player = await Player.objects.aget(telegram_chat_id=str(chat_id))
     except Player.DoesNotExist:
         await update.message.reply_text(
             "You're not registered yet! Use /start to create your account."
         )
+        return
+    
+    if not await PlayerWeapon.objects.filter(player=player).aexists():
+        await update.message.reply_text(
+            f"Your inventory is empty! 😔\n\n"
+            f"You have {player.cash} coins to buy weapons!\n"
+            f"Visit our website to purchase weapons."
+        )
+        return
+    
+    text, keyboard = await build_inventory_message(player, 1)
+    await update.message.reply_text(text, reply_markup=keyboard)
+
+
+async def inventory_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle the inventory prev/next buttons - edit the same message in place
+    """
+    from inventory.models import Player
+    
+    query = update.callback_query
+    await query.answer()
+    
+    try:
+        page = int(query.data.split(':', 1)[1])
+        player = await Player.objects.aget(telegram_chat_id=str(query.message.chat.id))
+    except (ValueError, IndexError, Player.DoesNotExist):
+        return
+    
+    text, keyboard = await build_inventory_message(player, page)
+    try:
+        await query.edit_message_text(text, reply_markup=keyboard)
+    except BadRequest as e:
+        # pressing the current page button changes nothing
+        if 'not modified' not in str(e):
+            raise
 
 async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle /profile command - Show user profile
     """
+    from inventory.models import Player
+    
     chat_id = update.effective_chat.id
     
     try:
@@ -165,16 +253,32 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(help_text)
 
+def setup_django():
+    """
+    Load Django only when the bot actually starts, importing this module
+    (management commands, startup_profile) stays side effect free
+    """
+    import django
+    
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cod_inventory.settings')
+    django.setup()
+
 def main():
     """
     Main function to run the Telegram bot
     """
+    setup_django()
+    
+    from inventory import snapshot
+    snapshot.start()
+    
     # Create the Application
     application = Application.builder().token(settings.TELEGRAM_BOT_TOKEN).build()
 
     # Add command handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("inventory", inventory_command))
+    application.add_handler(CallbackQueryHandler(inventory_page_callback, pattern=r"^inv:\d+$"))
     application.add_handler(CommandHandler("profile", profile_command))
     application.add_handler(CommandHandler("help", help_command))
 
@@ -0,0 +1,161 @@
+# telegram_bot/broadcast.py
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from telegram import Bot
+from telegram.error import Forbidden, BadRequest, RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
+
+from inventory.models import Player
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+
+class TokenBucket:
+    """
+    Async token bucket, `rate` tokens per second with bursts up to `capacity`
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        # telegram told us to back off, nobody sends until then
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Broadcaster:
+    """
+    Sends one Broadcast to every player with a telegram_chat_id.
+
+    Recipients are read by keyset in chunks and the checkpoint is saved after
+    every chunk, so a crashed run resumes from the last finished chunk. Players
+    in the chunk that was in flight may get the message twice.
+    """
+
+    def __init__(self, broadcast, bot=None, rate=None, chat_interval=None, chunk_size=None):
+        self.broadcast = broadcast
+        self.rate = rate or settings.TELEGRAM_BROADCAST_RATE
+        self.chat_interval = chat_interval or settings.TELEGRAM_BROADCAST_CHAT_INTERVAL
+        self.chunk_size = chunk_size or settings.TELEGRAM_BROADCAST_CHUNK_SIZE
+        self.bot = bot or Bot(
+            settings.TELEGRAM_BOT_TOKEN,
+            base_url=settings.TELEGRAM_API_BASE_URL,
+            request=HTTPXRequest(connection_pool_size=self.rate),
+        )
+        self.bucket = TokenBucket(self.rate)
+        self.last_sent = {}
+
+    async def recipients(self):
+        """
+        Yield lists of (player_id, chat_id) after the checkpoint
+        """
+        cursor = self.broadcast.last_player_id
+        while True:
+            chunk = [
+                row async for row in Player.objects
+                .filter(id__gt=cursor, telegram_chat_id__isnull=False)
+                .exclude(telegram_chat_id='')
+                .order_by('id')
+                .values_list('id', 'telegram_chat_id')[:self.chunk_size]
+            ]
+            if not chunk:
+                return
+            yield chunk
+            cursor = chunk[-1][0]
+
+    async def wait_for_chat(self, chat_id):
+        wait = self.last_sent.get(chat_id, 0.0) + self.chat_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def send(self, chat_id):
+        for attempt in range(MAX_ATTEMPTS):
+            await self.wait_for_chat(chat_id)
+            await self.bucket.acquire()
+            self.last_sent[chat_id] = time.monotonic()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=self.broadcast.text)
+                return True
+            except RetryAfter as e:
+                delay = e.retry_after
+                if isinstance(delay, timedelta):
+                    delay = delay.total_seconds()
+                logger.warning(f"Rate limited by Telegram, pausing {delay}s")
+                self.bucket.pause(delay)
+            except (Forbidden, BadRequest) as e:
+                # blocked the bot, deleted account, bad chat id - retrying won't help
+                logger.info(f"Skipping chat {chat_id}: {str(e)}")
+                return False
+            except TelegramError as e:
+                logger.warning(f"Send to chat {chat_id} failed (attempt {attempt + 1}): {str(e)}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+        return False
+
+    async def run(self):
+        broadcast = self.broadcast
+        broadcast.status = 'running'
+        await broadcast.asave(update_fields=['status', 'updated_at'])
+
+        started = time.monotonic()
+        delivered = 0
+        try:
+            async with self.bot:
+                async for chunk in self.recipients():
+                    results = await asyncio.gather(*(self.send(chat_id) for _, chat_id in chunk))
+
+                    sent = sum(results)
+                    delivered += sent
+                    broadcast.sent += sent
+                    broadcast.failed += len(results) - sent
+                    broadcast.last_player_id = chunk[-1][0]
+                    await broadcast.asave(update_fields=['sent', 'failed', 'last_player_id', 'updated_at'])
+
+                    elapsed = time.monotonic() - started
+                    logger.info(
+                        f"Broadcast #{broadcast.pk}: {broadcast.sent} sent, {broadcast.failed} failed, "
+                        f"{delivered / elapsed:.1f} msg/s"
+                    )
+        except BaseException:
+            broadcast.status = 'failed'
+            await broadcast.asave(update_fields=['status', 'updated_at'])
+            raise
+
+        broadcast.status = 'done'
+        broadcast.finished_at = timezone.now()
+        await broadcast.asave(update_fields=['status', 'finished_at', 'updated_at'])
+
+        elapsed = time.monotonic() - started
+        return {
+            'sent': broadcast.sent,
+            'failed': broadcast.failed,
+            'seconds': elapsed,
+            'rate': delivered / elapsed if elapsed else 0.0,
+        }
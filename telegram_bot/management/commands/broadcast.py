@@ -0,0 +1,35 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from telegram_bot.broadcast import Broadcaster
+from telegram_bot.models import Broadcast
+
+
+class Command(BaseCommand):
+    help = 'Send a message to every player with a linked Telegram chat, or resume an unfinished broadcast'
+
+    def add_arguments(self, parser):
+        parser.add_argument('text', nargs='?', help='message to send')
+        parser.add_argument('--resume', type=int, help='id of a broadcast to continue from its checkpoint')
+        parser.add_argument('--rate', type=int, help='messages per second across all chats')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                broadcast = Broadcast.objects.get(pk=options['resume'])
+            except Broadcast.DoesNotExist:
+                raise CommandError(f"Broadcast #{options['resume']} not found")
+            if broadcast.status == 'done':
+                raise CommandError(f"Broadcast #{broadcast.pk} already finished")
+        elif options['text']:
+            broadcast = Broadcast.objects.create(text=options['text'])
+        else:
+            raise CommandError('Give a message text or --resume <id>')
+
+        self.stdout.write(f"Broadcast #{broadcast.pk} starting after player {broadcast.last_player_id}")
+        result = asyncio.run(Broadcaster(broadcast, rate=options['rate']).run())
+        self.stdout.write(self.style.SUCCESS(
+            f"Broadcast #{broadcast.pk} done: {result['sent']} sent, {result['failed']} failed "
+            f"in {result['seconds']:.1f}s ({result['rate']:.1f} msg/s)"
+        ))
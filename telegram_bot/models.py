@@ -1,3 +1,24 @@
 from django.db import models
 
 # Create your models here.
+
+class Broadcast(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    text = models.TextField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='pending')
+    # keyset checkpoint, every player with id <= this already got the message
+    last_player_id = models.BigIntegerField(default=0)
+    sent = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Broadcast #{self.pk} ({self.status}, {self.sent} sent)"
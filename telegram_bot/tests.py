@@ -1,3 +1,184 @@
-from django.test import TestCase
+import asyncio
+import functools
+import time
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs
 
-# Create your tests here.
+import httpx
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from telegram.request import HTTPXRequest
+
+from inventory.models import Player, Weapon, PlayerWeapon
+from inventory.testing import InventoryTestCase, InventoryTransactionTestCase
+from .bot import render_inventory_page
+from .models import Broadcast
+from . import broadcast
+
+
+class InventoryPageTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.player = Player.objects.create_user('bot_player', password='secret-pass')
+        self.weapon = Weapon.objects.create(
+            name='AK-47', weapon_type='assault_rifle', rarity='common', price=10, damage=50, range=50, accuracy=50,
+        )
+
+    def test_per_process_cache_never_serves_stale_pages(self):
+        text, _, _ = render_inventory_page(self.player.pk, 1)
+        self.assertEqual(text, '')
+
+        # bought through another process, which can't bump this process's versions
+        PlayerWeapon.objects.bulk_create([PlayerWeapon(player=self.player, weapon=self.weapon, quantity=2)])
+
+        text, page, total_pages = render_inventory_page(self.player.pk, 1)
+        self.assertIn('AK-47', text)
+        self.assertEqual((page, total_pages), (1, 1))
+
+    def test_purchases_go_through_with_the_cache_down(self):
+        client = APIClient()
+        client.force_authenticate(self.player)
+        down = mock.Mock(**{'incr.side_effect': ConnectionError('cache down')})
+
+        with mock.patch('inventory.catalog.cache', down), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = client.post(reverse('add_weapon'), {'weapon_id': self.weapon.pk}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(callbacks)
+        down.incr.assert_called_once()
+        self.assertTrue(PlayerWeapon.objects.filter(player=self.player, weapon=self.weapon).exists())
+
+    def test_page_loads_only_its_slice(self):
+        weapons = Weapon.objects.bulk_create([
+            Weapon(name=f'Weapon {i:02}', weapon_type='pistol', rarity='rare', price=1, damage=1, range=1, accuracy=1)
+            for i in range(25)
+        ])
+        PlayerWeapon.objects.bulk_create([PlayerWeapon(player=self.player, weapon=weapon) for weapon in weapons])
+
+        # the count and the page's rows, nothing else
+        with self.assertNumQueries(2):
+            text, page, total_pages = render_inventory_page(self.player.pk, 3)
+
+        self.assertEqual((page, total_pages), (3, 3))
+        self.assertEqual(text.count('•'), 5)
+        self.assertIn('Weapon 24', text)
+
+
+class FakeBotApi:
+    """
+    Stands in for api.telegram.org through an httpx mock transport. `replies`
+    maps a chat id to the (status, parameters) answers it gets, in order,
+    before it starts succeeding. 'crash' never answers, like a dead process.
+    """
+
+    def __init__(self, replies=None):
+        self.replies = replies or {}
+        self.calls = []
+        self.crashed = asyncio.Event()
+
+    async def __call__(self, request):
+        method = request.url.path.rsplit('/', 1)[-1]
+        if method == 'getMe':
+            return httpx.Response(200, json={
+                'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'COD', 'username': 'cod_bot'},
+            })
+
+        chat_id = parse_qs(request.content.decode())['chat_id'][0]
+        self.calls.append((chat_id, time.monotonic()))
+        pending = self.replies.get(chat_id)
+        reply = pending.pop(0) if pending else 'ok'
+
+        if reply == 'crash':
+            self.crashed.set()
+            await asyncio.Event().wait()
+        if reply == 'ok':
+            return httpx.Response(200, json={'ok': True, 'result': {
+                'message_id': len(self.calls), 'date': int(time.time()), 'chat': {'id': int(chat_id), 'type': 'private'},
+            }})
+        status, description, parameters = reply
+        return httpx.Response(status, json={
+            'ok': False, 'error_code': status, 'description': description, 'parameters': parameters,
+        })
+
+    def sent_to(self, chat_id):
+        return [at for chat, at in self.calls if chat == chat_id]
+
+    def patch(self):
+        # every Bot the broadcaster builds talks to this instead of telegram
+        transport = httpx.MockTransport(self)
+        return mock.patch.object(broadcast, 'HTTPXRequest', functools.partial(
+            HTTPXRequest, httpx_kwargs={'transport': transport},
+        ))
+
+
+TOO_MANY = (429, 'Too Many Requests: retry after 1', {'retry_after': 1})
+BLOCKED = (403, 'Forbidden: bot was blocked by the user', {})
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='123:ABC', TELEGRAM_BROADCAST_CHAT_INTERVAL=0.01)
+class BroadcastTests(InventoryTransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.players = [
+            Player.objects.create_user(f'listener_{i}', password='secret-pass', telegram_chat_id=str(1000 + i))
+            for i in range(5)
+        ]
+        Player.objects.create_user('no_telegram', password='secret-pass')
+
+    def run_broadcast(self, api, text='Double XP weekend', chunk_size=2):
+        message = Broadcast.objects.create(text=text)
+        with api.patch():
+            asyncio.run(broadcast.Broadcaster(message, rate=50, chunk_size=chunk_size).run())
+        message.refresh_from_db()
+        return message
+
+    def test_rate_limit_pauses_the_bucket(self):
+        api = FakeBotApi({'1000': [TOO_MANY]})
+
+        message = self.run_broadcast(api)
+
+        self.assertEqual((message.status, message.sent, message.failed), ('done', 5, 0))
+        first, retry = api.sent_to('1000')
+        # nobody sends while telegram's retry_after runs
+        self.assertGreaterEqual(retry - first, 0.95)
+        self.assertTrue(all(at - first >= 0.95 for chat, at in api.calls if chat != '1000' and at > first))
+
+    def test_blocked_chat_counts_as_failed_and_is_not_retried(self):
+        api = FakeBotApi({'1001': [BLOCKED, BLOCKED]})
+
+        message = self.run_broadcast(api)
+
+        self.assertEqual((message.status, message.sent, message.failed), ('done', 4, 1))
+        self.assertEqual(len(api.sent_to('1001')), 1)
+
+    def test_resume_after_a_crash(self):
+        api = FakeBotApi({'1002': ['crash']})
+        message = Broadcast.objects.create(text='Season 2 is live')
+
+        async def crash():
+            run = asyncio.ensure_future(broadcast.Broadcaster(message, rate=50, chunk_size=2).run())
+            await api.crashed.wait()
+            run.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await run
+
+        with api.patch():
+            asyncio.run(crash())
+        message.refresh_from_db()
+        # only the first chunk was checkpointed
+        self.assertEqual((message.status, message.last_player_id), ('failed', self.players[1].pk))
+
+        with api.patch(), override_settings(TELEGRAM_BROADCAST_CHUNK_SIZE=2):
+            call_command('broadcast', '--resume', str(message.pk), stdout=StringIO())
+        message.refresh_from_db()
+
+        self.assertEqual((message.status, message.sent, message.failed), ('done', 5, 0))
+        for player in self.players[:2]:
+            self.assertEqual(len(api.sent_to(player.telegram_chat_id)), 1)
+        for player in self.players[2:]:
+            self.assertTrue(api.sent_to(player.telegram_chat_id))